@@ -0,0 +1,195 @@
+"""
+Headless acquisition daemon.
+
+Owns every board connection (through BoardManager) and shares one poll
+stream with any number of local clients over HTTP/JSON:
+
+    GET  /boards                       -> {"boards": {name: {room, type}}}
+    GET  /snapshot[?board=name]        -> {"version": n, "boards": {...}}
+    GET  /changes?since=n&timeout=s    -> long-poll: {"version": n, "changes": [[v, board, {field: value}], ...],
+                                                      "states": {board: link state}}
+    POST /set {"board", "value", "confirm"} -> {"ok": bool}
+    GET  /stats                        -> {board: link stats or null}
+    GET  /metrics                      -> Prometheus text format
+
+    python acquisition_daemon.py boards.json --port 8765
+
+Clients never touch the serial ports, so they add no serial traffic.
+See daemon_client.py for the client side.
+"""
+import json
+import threading
+import argparse
+from collections import deque
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+from board_manager import BoardManager
+from link_stats import render_prometheus
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+
+class AcquisitionDaemon:
+    def __init__(self, manager, host=DEFAULT_HOST, port=DEFAULT_PORT, backlog=4096):
+        self.manager = manager
+        self.host = host
+        self.port = port
+        self.version = 0
+        self.events = deque(maxlen=backlog)   # (version, board, {field: value})
+        self.cond = threading.Condition()
+        self.server = None
+        self.thread = None
+
+    def start(self):
+        for name, board in self.manager.boards.items():
+            board.connection.addChangeListener(self._change_listener(name))
+        opened = self.manager.open_all()
+        for name, ok in opened.items():
+            if not ok:
+                print(f"[!] {name}: could not open {self.manager.get(name).comPort}")
+        self.manager.start()
+        self.server = ThreadingHTTPServer((self.host, self.port), _Handler)
+        self.server.daemon_threads = True
+        self.server.owner = self
+        self.thread = threading.Thread(target=self.server.serve_forever, name="daemon-http", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+        self.manager.close_all()
+        with self.cond:
+            self.cond.notify_all()
+
+    def _change_listener(self, name):
+        def on_change(connection, changed):
+            with self.cond:
+                self.version += 1
+                self.events.append((self.version, name, dict(changed)))
+                self.cond.notify_all()
+        return on_change
+
+    # --- API used by the HTTP handler ---
+    def boards(self):
+        return {name: {"room": b.room, "type": b.kind} for name, b in self.manager.boards.items()}
+
+    def snapshot(self, board=None):
+        snap = self.manager.snapshot()
+        if board is not None:
+            snap = {board: snap[board]} if board in snap else {}
+        return {"version": self.version, "boards": snap}
+
+    def changes(self, since, timeout):
+        """ Blocks until something newer than `since` arrives (or timeout) """
+        with self.cond:
+            self.cond.wait_for(lambda: self.version > since or self.server is None, timeout)
+            oldest = self.events[0][0] if self.events else self.version + 1
+            result = {"version": self.version,
+                      "changes": [list(e) for e in self.events if e[0] > since],
+                      "states": {name: b.connection.getState() for name, b in self.manager.boards.items()}}
+            if since + 1 < oldest and self.version > since:
+                # Client fell behind the backlog: tell it to take a fresh snapshot
+                result["resync"] = True
+            return result
+
+    def stats(self):
+        return {name: b.connection.getStats() for name, b in self.manager.boards.items()}
+
+    def metrics(self):
+        return render_prometheus({name: b.connection for name, b in self.manager.boards.items()})
+
+    def set_value(self, board, value, confirm=False, timeout=2.0):
+        managed = self.manager.boards.get(board)
+        if managed is None:
+            raise KeyError(board)
+        conn = managed.connection
+        if managed.kind == "ac":
+            future = conn.setDesiredTemp(value, confirm)
+        else:
+            future = conn.setCurtainStatus(value, confirm)
+        if future is False:
+            return False
+        try:
+            return bool(future.result(timeout))
+        except Exception:
+            return False
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, fmt, *args):
+        pass   # keep the console for board errors
+
+    def _reply(self, status, payload, content_type="application/json"):
+        body = payload.encode() if isinstance(payload, str) else json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        owner = self.server.owner
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        try:
+            if url.path == "/boards":
+                self._reply(200, {"boards": owner.boards()})
+            elif url.path == "/snapshot":
+                self._reply(200, owner.snapshot(query.get("board", [None])[0]))
+            elif url.path == "/changes":
+                since = int(query.get("since", ["0"])[0])
+                timeout = min(60.0, float(query.get("timeout", ["25"])[0]))
+                self._reply(200, owner.changes(since, timeout))
+            elif url.path == "/stats":
+                self._reply(200, owner.stats())
+            elif url.path == "/metrics":
+                self._reply(200, owner.metrics(), "text/plain; version=0.0.4")
+            else:
+                self._reply(404, {"error": "not found"})
+        except ValueError as e:
+            self._reply(400, {"error": str(e)})
+
+    def do_POST(self):
+        owner = self.server.owner
+        try:
+            length = int(self.headers.get("Content-Length", "0"))
+            request = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError as e:
+            self._reply(400, {"error": str(e)})
+            return
+        if urlparse(self.path).path != "/set":
+            self._reply(404, {"error": "not found"})
+            return
+        try:
+            ok = owner.set_value(request["board"], float(request["value"]), bool(request.get("confirm", False)))
+            self._reply(200, {"ok": ok})
+        except KeyError as e:
+            self._reply(404, {"error": f"unknown board or field {e}"})
+        except (TypeError, ValueError) as e:
+            self._reply(400, {"error": str(e)})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Smart home acquisition daemon")
+    parser.add_argument("config", help="BoardManager JSON config")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    args = parser.parse_args()
+
+    daemon = AcquisitionDaemon(BoardManager.from_config(args.config), args.host, args.port)
+    daemon.start()
+    print(f"Serving {len(daemon.manager.boards)} boards on http://{args.host}:{args.port}  (Ctrl+C to stop)")
+    try:
+        daemon.thread.join()
+    except KeyboardInterrupt:
+        print("\nStopping...")
+        daemon.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""
+Driver benchmark against the pty emulator.
+
+Measures update() and set-command latency (p50/p95/p99), sustained snapshot
+rate, a mixed read/write load and a lossy link for both connection classes,
+and writes everything to JSON:
+
+    python benchmark.py -o bench.json
+    python benchmark.py -o new.json --baseline bench.json   # exit 1 on regression
+"""
+import sys
+import json
+import time
+import platform
+import argparse
+from board_emulator import BoardEmulator, AirConditionerModel, CurtainModel
+from smart_home_api import AirConditionerSystemConnection, CurtainControlSystemConnection
+
+BOARDS = {
+    "ac": (AirConditionerSystemConnection, AirConditionerModel,
+           lambda conn, i, confirm=False: conn.setDesiredTemp(20.0 + (i % 10), confirm)),
+    "curtain": (CurtainControlSystemConnection, CurtainModel,
+                lambda conn, i, confirm=False: conn.setCurtainStatus(float((i * 7) % 63), confirm)),
+}
+
+
+def percentile(samples, pct):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+def summarize(samples):
+    return {
+        "count": len(samples),
+        "p50_ms": percentile(samples, 50) * 1000.0 if samples else None,
+        "p95_ms": percentile(samples, 95) * 1000.0 if samples else None,
+        "p99_ms": percentile(samples, 99) * 1000.0 if samples else None,
+        "max_ms": max(samples) * 1000.0 if samples else None,
+    }
+
+
+def timed(fn):
+    started = time.perf_counter()
+    fn()
+    return time.perf_counter() - started
+
+
+def connect(board, **link):
+    conn_cls, model_cls, set_cmd = BOARDS[board]
+    emu = BoardEmulator(model_cls(), **link)
+    emu.start()
+    conn = conn_cls()
+    conn.setComPort(emu.port)
+    if not conn.open():
+        emu.stop()
+        raise RuntimeError(f"could not open emulator for {board}")
+    return emu, conn, set_cmd
+
+
+def bench_board(board, iterations, duration, link, lossy_link, write_every):
+    result = {}
+
+    emu, conn, set_cmd = connect(board, **link)
+    try:
+        result["inter_byte_gap_ms"] = conn.getInterByteGap() * 1000.0
+        result["poll"] = summarize([timed(conn.update) for _ in range(iterations)])
+        # Until the SET transaction has been written (set_* return a Future)
+        result["command"] = summarize([timed(lambda: set_cmd(conn, i).result()) for i in range(iterations)])
+        result["command_confirmed"] = summarize([timed(lambda: set_cmd(conn, i, True).result())
+                                                 for i in range(iterations)])
+
+        count = 0
+        deadline = time.perf_counter() + duration
+        started = time.perf_counter()
+        while time.perf_counter() < deadline:
+            conn.update()
+            count += 1
+        result["sustained"] = {"snapshots_per_s": count / (time.perf_counter() - started)}
+
+        count = 0
+        polls = []
+        deadline = time.perf_counter() + duration
+        started = time.perf_counter()
+        while time.perf_counter() < deadline:
+            polls.append(timed(conn.update))
+            count += 1
+            if count % write_every == 0:
+                set_cmd(conn, count)
+        result["mixed"] = dict(summarize(polls), snapshots_per_s=count / (time.perf_counter() - started))
+    finally:
+        conn.close()
+        emu.stop()
+
+    emu, conn, set_cmd = connect(board, **lossy_link)
+    try:
+        count = 0
+        polls = []
+        deadline = time.perf_counter() + duration
+        started = time.perf_counter()
+        while time.perf_counter() < deadline:
+            polls.append(timed(conn.update))
+            count += 1
+        result["lossy"] = dict(summarize(polls), snapshots_per_s=count / (time.perf_counter() - started),
+                               loss=lossy_link["loss"])
+    finally:
+        conn.close()
+        emu.stop()
+    return result
+
+
+def compare(current, baseline, tolerance):
+    """ Returns a list of regressions: p95 latency up or throughput down by more than tolerance """
+    regressions = []
+    for board, scenarios in current["results"].items():
+        for name, stats in scenarios.items():
+            if not isinstance(stats, dict):
+                continue
+            old = baseline.get("results", {}).get(board, {}).get(name, {})
+            if stats.get("p95_ms") and old.get("p95_ms") and stats["p95_ms"] > old["p95_ms"] * (1 + tolerance):
+                regressions.append(f"{board}.{name}.p95_ms {old['p95_ms']:.2f} -> {stats['p95_ms']:.2f}")
+            if stats.get("snapshots_per_s") and old.get("snapshots_per_s") and \
+                    stats["snapshots_per_s"] < old["snapshots_per_s"] * (1 - tolerance):
+                regressions.append(f"{board}.{name}.snapshots_per_s {old['snapshots_per_s']:.1f} -> "
+                                   f"{stats['snapshots_per_s']:.1f}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Smart home driver benchmark (uses board_emulator)")
+    parser.add_argument("-o", "--output", default="-", help="JSON output file, '-' for stdout")
+    parser.add_argument("--boards", nargs="+", choices=sorted(BOARDS), default=sorted(BOARDS))
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=3.0, help="seconds per throughput scenario")
+    parser.add_argument("--latency", type=float, default=0.001, help="emulated reply latency (s)")
+    parser.add_argument("--jitter", type=float, default=0.0005)
+    parser.add_argument("--loss", type=float, default=0.02, help="byte loss for the lossy scenario")
+    parser.add_argument("--write-every", type=int, default=5, help="mixed load: one set per N polls")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--baseline", help="previous JSON result to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    link = {"latency": args.latency, "jitter": args.jitter, "seed": args.seed}
+    lossy_link = dict(link, loss=args.loss)
+
+    report = {
+        "meta": {
+            "timestamp": time.time(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "args": vars(args),
+        },
+        "results": {},
+    }
+    for board in args.boards:
+        print(f"Benchmarking {board}...", file=sys.stderr)
+        report["results"][board] = bench_board(board, args.iterations, args.duration,
+                                               link, lossy_link, args.write_every)
+
+    text = json.dumps(report, indent=2)
+    if args.output == "-":
+        print(text)
+    else:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""
+Software emulator of the Board 1 / Board 2 UART protocol.
+
+Each emulator opens a pseudo-terminal and answers on it like the PIC firmware,
+so the unmodified driver classes can connect to `emulator.port`:
+
+    emu = BoardEmulator(AirConditionerModel(), latency=0.002, loss=0.01)
+    emu.start()
+    ac = AirConditionerSystemConnection()
+    ac.setComPort(emu.port)
+    ac.open()
+
+Linux/macOS only (uses pty).
+"""
+import os
+import pty
+import tty
+import math
+import heapq
+import random
+import select
+import threading
+import time
+import argparse
+
+
+def _split(value):
+    """ 23.4 -> (4, 23) : frac digit, int byte, the way the firmware stores values """
+    value = max(0.0, value)
+    int_part = int(value)
+    frac_part = int(round((value - int_part) * 10))
+    if frac_part == 10:
+        int_part, frac_part = int_part + 1, 0
+    return frac_part, min(int_part, 255)
+
+
+class AirConditionerModel:
+    """ Board #1 firmware: registers, SET handling and a first-order room model """
+    def __init__(self, ambient=20.0, desired=25.0, tau=120.0):
+        self.ambient = ambient
+        self.desired_int = int(desired)
+        self.desired_frac = int(round((desired - int(desired)) * 10))
+        self.tau = tau          # seconds for ambient to cover ~63% of the gap to target
+        self.fan = 0
+
+    @property
+    def desired(self):
+        return self.desired_int + self.desired_frac / 10.0
+
+    def step(self, dt):
+        self.ambient += (self.desired - self.ambient) * (1.0 - math.exp(-dt / self.tau))
+        # CALC_FAN_LOGIC: 2 * (amb_int - des_int), 0 when colder than target, max 99
+        diff = int(self.ambient) - self.desired_int
+        self.fan = 0 if diff < 0 else min(99, diff * 2)
+
+    def handle(self, byte_val):
+        """ Returns the reply byte, or None when the firmware stays silent """
+        amb_frac, amb_int = _split(self.ambient)
+        replies = {0x01: self.desired_frac, 0x02: self.desired_int,
+                   0x03: amb_frac, 0x04: amb_int, 0x05: self.fan}
+        if byte_val in replies:
+            return replies[byte_val]
+        if byte_val & 0xC0 == 0x80:
+            self.desired_frac = byte_val & 0x3F
+        elif byte_val & 0xC0 == 0xC0:
+            self.desired_int = byte_val & 0x3F
+        return None
+
+
+class CurtainModel:
+    """ Board #2 firmware: curtain motor plus slowly drifting outdoor sensors """
+    def __init__(self, curtain=0.0, outdoor=22.0, pressure=23843, light=120.0,
+                 travel_rate=10.0, seed=None):
+        self.target_int = int(curtain)
+        self.target_frac = 0
+        self.position = curtain
+        self.travel_rate = travel_rate    # % per second
+        self.outdoor = outdoor
+        self.pressure = pressure          # raw BMP180 reading, as PRESSURE_H:PRESSURE_L
+        self.light = light
+        self.t = 0.0
+        self.rng = random.Random(seed)
+
+    @property
+    def target(self):
+        return self.target_int + self.target_frac / 10.0
+
+    def step(self, dt):
+        self.t += dt
+        move = self.travel_rate * dt
+        delta = self.target - self.position
+        self.position += max(-move, min(move, delta))
+        # Small random walks around the starting sensor values
+        self.outdoor += self.rng.gauss(0.0, 0.02) * math.sqrt(dt)
+        self.pressure = min(65535.0, max(0.0, self.pressure + self.rng.gauss(0.0, 2.0) * math.sqrt(dt)))
+        self.light = min(255.0, max(0.0, self.light + self.rng.gauss(0.0, 0.5) * math.sqrt(dt)))
+
+    def handle(self, byte_val):
+        if byte_val & 0x80:
+            if byte_val & 0x40:
+                # SET_INT goes through MAP_63_TO_100
+                self.target_int = int(round((byte_val & 0x3F) * 100 / 63))
+            else:
+                self.target_frac = byte_val & 0x3F
+            return None
+        out_frac, out_int = _split(self.outdoor)
+        # SND_PRES_L / SND_PRES_H send the raw sensor bytes, no decimal split
+        pressure = int(self.pressure)
+        replies = {0x01: self.target_frac, 0x02: self.target_int,
+                   0x03: out_frac, 0x04: out_int,
+                   0x05: pressure & 0xFF, 0x06: pressure >> 8,
+                   0x07: 0, 0x08: int(self.light)}
+        return replies.get(byte_val)
+
+
+class BoardEmulator:
+    """
+    Serves a board model on a pty.
+      latency/jitter : reply delay, seconds (jitter is uniform 0..jitter)
+      loss           : probability that a byte is lost, in either direction
+      service_time   : firmware main-loop time per received byte
+      fifo_depth     : USART RX FIFO; bytes beyond it while busy are overrun
+      lock_on_overrun: Board 1 firmware never clears OERR and goes deaf
+    """
+    def __init__(self, model, latency=0.0, jitter=0.0, loss=0.0, seed=None,
+                 service_time=0.0, fifo_depth=2, lock_on_overrun=False, tick=0.01):
+        self.model = model
+        self.latency = latency
+        self.jitter = jitter
+        self.loss = loss
+        self.service_time = service_time
+        self.fifo_depth = fifo_depth
+        self.lock_on_overrun = lock_on_overrun
+        self.tick = tick
+        self.rng = random.Random(seed)
+        self.port = None
+        self.master = None
+        self.slave = None
+        self.running = False
+        self.thread = None
+        self.overruns = 0
+        self.locked = False
+        self.rx_bytes = 0
+        self.tx_bytes = 0
+
+    def start(self):
+        self.master, self.slave = pty.openpty()
+        tty.setraw(self.slave)
+        self.port = os.ttyname(self.slave)
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        return self.port
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join(1.0)
+        for fd in (self.master, self.slave):
+            if fd is not None:
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
+        self.master = self.slave = None
+
+    def _lost(self):
+        return self.loss > 0 and self.rng.random() < self.loss
+
+    def _run(self):
+        pending = []      # heap of (due time, seq, reply byte)
+        busy = []         # completion times of bytes still in the firmware FIFO
+        seq = 0
+        last_due = 0.0
+        last = time.monotonic()
+        while self.running:
+            now = time.monotonic()
+            self.model.step(now - last)
+            last = now
+
+            timeout = self.tick
+            if pending:
+                timeout = max(0.0, min(timeout, pending[0][0] - now))
+            try:
+                ready, _, _ = select.select([self.master], [], [], timeout)
+            except (OSError, ValueError):
+                break
+
+            now = time.monotonic()
+            if ready:
+                try:
+                    data = os.read(self.master, 64)
+                except OSError:
+                    break
+                for byte_val in data:
+                    self.rx_bytes += 1
+                    if self.locked or self._lost():
+                        continue
+                    busy = [t for t in busy if t > now]
+                    if len(busy) > self.fifo_depth:
+                        self.overruns += 1
+                        if self.lock_on_overrun:
+                            self.locked = True
+                        continue
+                    done = max([now] + busy) + self.service_time
+                    busy.append(done)
+                    reply = self.model.handle(byte_val)
+                    if reply is None or self._lost():
+                        continue
+                    # Jitter delays replies but a UART never reorders them
+                    due = max(last_due, done + self.latency + self.rng.uniform(0.0, self.jitter))
+                    last_due = due
+                    heapq.heappush(pending, (due, seq, reply & 0xFF))
+                    seq += 1
+
+            out = bytearray()
+            while pending and pending[0][0] <= now:
+                out.append(heapq.heappop(pending)[2])
+            if out:
+                try:
+                    os.write(self.master, bytes(out))
+                    self.tx_bytes += len(out)
+                except OSError:
+                    break
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Board 1 / Board 2 firmware emulator on a pty")
+    parser.add_argument("--board", type=int, choices=(1, 2), default=1)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--loss", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    model = AirConditionerModel() if args.board == 1 else CurtainModel(seed=args.seed)
+    emu = BoardEmulator(model, latency=args.latency, jitter=args.jitter, loss=args.loss,
+                        seed=args.seed, lock_on_overrun=(args.board == 1))
+    print(f"Board {args.board} emulator listening on {emu.start()}  (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        emu.stop()
+
+
+if __name__ == "__main__":
+    main()
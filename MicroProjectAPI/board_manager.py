@@ -0,0 +1,266 @@
+"""
+Multi-board bus manager.
+
+Registers any number of AC / curtain boards (usually one pair per room),
+polls them in parallel on a bounded worker pool and serves one aggregated
+snapshot. Config file (JSON):
+
+    {
+      "period": 0.5,
+      "workers": 16,
+      "history": 262144,
+      "telemetry": "telemetry",
+      "shared_memory": "smarthome",
+      "stats": true,
+      "rules": "rules.json",
+      "schedule": "schedule.json",
+      "simulation_seed": 0,
+      "simulation_speed": 1.0,
+      "boards": [
+        {"name": "living-ac",      "room": "Living Room", "type": "ac",      "port": "COM7"},
+        {"name": "living-curtain", "room": "Living Room", "type": "curtain", "port": "COM9",
+         "trace": "living-curtain.htr",
+         "filters": {"lightIntensity": [{"type": "median", "size": 5}, {"type": "deadband", "threshold": 2}]}},
+        {"name": "test-ac",        "room": "Lab",         "type": "ac",      "port": "SIM",
+         "simulation": true}
+      ]
+    }
+
+All boards with "simulation": true share one seeded SimulatedFleet
+(fleet_sim.py writes such configs for load tests). History and telemetry
+record raw values; with "filters" (see sensor_filters.build_filters) the
+board is registered behind a FilterStage, so everything else sees the
+filtered ones.
+"""
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from smart_home_api import AirConditionerSystemConnection, CurtainControlSystemConnection
+
+BOARD_TYPES = {
+    "ac": AirConditionerSystemConnection,
+    "curtain": CurtainControlSystemConnection,
+}
+
+
+class ManagedBoard:
+    def __init__(self, name, connection, room=None, kind=None):
+        self.name = name
+        self.connection = connection
+        self.room = room
+        self.kind = kind
+        self.last_poll = None       # monotonic time of the last finished update()
+        self.poll_duration = None   # seconds the last update() took
+        self.polls = 0
+
+    def is_active(self):
+        return self.connection.is_connected or getattr(self.connection, "simulation_mode", False)
+
+
+class BoardManager:
+    """
+    Each board is re-polled `period` seconds after its previous poll started,
+    independent of the others. Updates run on a pool of `workers` threads; the
+    serial I/O itself happens on each port's own scheduler thread.
+    """
+    def __init__(self, period=0.5, workers=16):
+        self.period = period
+        self.workers = workers
+        self.boards = {}
+        self.lock = threading.Lock()
+        self.running = False
+        self.thread = None
+        self.pool = None
+        self.telemetry = None
+        self.snapshots = None   # SnapshotPublisher for other processes
+        self.rules = None
+        self.scheduler = None   # SetpointScheduler, runs while the manager runs
+        self.fleet = None       # SimulatedFleet behind the simulated boards
+
+    @classmethod
+    def from_config(cls, path):
+        with open(path) as f:
+            config = json.load(f)
+        manager = cls(period=config.get("period", 0.5), workers=config.get("workers", 16))
+        if config.get("telemetry"):
+            from telemetry_log import TelemetryWriter
+            manager.telemetry = TelemetryWriter(config["telemetry"])
+        if config.get("shared_memory"):
+            from shm_snapshot import SnapshotPublisher
+            manager.snapshots = SnapshotPublisher(config["shared_memory"],
+                                                  max(256, len(config.get("boards", []))))
+        for entry in config.get("boards", []):
+            connection = BOARD_TYPES[entry["type"]]()
+            connection.setComPort(entry["port"])
+            if entry.get("simulation"):
+                if manager.fleet is None:
+                    from fleet_sim import SimulatedFleet
+                    manager.fleet = SimulatedFleet(seed=config.get("simulation_seed", 0),
+                                                   speed=config.get("simulation_speed", 1.0))
+                connection.set_simulation_mode(True, manager.fleet)
+            if config.get("stats"):
+                connection.enableStats()
+            if entry.get("trace"):
+                from serial_trace import trace_factory
+                connection.serialFactory = trace_factory(entry["trace"])
+            if config.get("history"):
+                # NumPy is only needed when history is switched on
+                from sensor_history import attach_history
+                attach_history(connection, config["history"])
+            if manager.telemetry is not None:
+                connection.addSampleListener(manager.telemetry.listener(entry["name"]))
+            if entry.get("filters"):
+                from sensor_filters import FilterStage, build_filters
+                connection = FilterStage(connection, build_filters(entry["filters"]))
+            manager.register(entry["name"], connection, entry.get("room"), entry["type"])
+            if manager.snapshots is not None:
+                from shm_snapshot import attach_snapshot
+                attach_snapshot(connection, manager.snapshots, entry["name"])
+        if config.get("rules"):
+            from rules_engine import RulesEngine, load_rules
+            manager.rules = RulesEngine()
+            manager.rules.attach(manager)
+            for rule in load_rules(config["rules"]):
+                manager.rules.add_rule(rule)
+        if config.get("schedule"):
+            from setpoint_scheduler import SetpointScheduler, load_schedule
+            manager.scheduler = SetpointScheduler()
+            manager.scheduler.attach(manager)
+            for board, days, at, value in load_schedule(config["schedule"]):
+                manager.scheduler.add(board, days, at, value)
+        return manager
+
+    def register(self, name, connection, room=None, kind=None):
+        if kind is None:
+            kind = next((k for k, c in BOARD_TYPES.items() if isinstance(connection, c)), None)
+        with self.lock:
+            self.boards[name] = ManagedBoard(name, connection, room, kind)
+        return connection
+
+    def unregister(self, name):
+        with self.lock:
+            return self.boards.pop(name, None)
+
+    def get(self, name):
+        return self.boards[name].connection
+
+    def open_all(self):
+        """ Opens (and calibrates) every port concurrently, returns {name: ok} """
+        boards = [b for b in self.boards.values() if not b.is_active()]
+        if not boards:
+            return {}
+        with ThreadPoolExecutor(max_workers=max(1, min(self.workers, len(boards)))) as pool:
+            results = pool.map(lambda b: b.connection.open(), boards)
+            return {b.name: ok for b, ok in zip(boards, results)}
+
+    def close_all(self):
+        self.stop()
+        if self.rules is not None:
+            self.rules.stop()
+        for board in list(self.boards.values()):
+            board.connection.close()
+        if self.telemetry is not None:
+            self.telemetry.close()
+        if self.snapshots is not None:
+            self.snapshots.close()
+            self.snapshots = None
+
+    def _poll(self, board):
+        started = time.monotonic()
+        try:
+            board.connection.update()
+        except Exception as e:
+            print(f"Update Error ({board.name}): {e}")
+        board.poll_duration = time.monotonic() - started
+        board.last_poll = time.monotonic()
+        board.polls += 1
+        return board
+
+    def poll_once(self):
+        """ One parallel pass over all active boards (blocking) """
+        boards = [b for b in list(self.boards.values()) if b.is_active()]
+        if not boards:
+            return
+        pool = self.pool or ThreadPoolExecutor(max_workers=max(1, min(self.workers, len(boards))))
+        try:
+            wait([pool.submit(self._poll, b) for b in boards])
+        finally:
+            if pool is not self.pool:
+                pool.shutdown()
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="board-poll")
+        self.thread = threading.Thread(target=self._run, name="board-manager", daemon=True)
+        self.thread.start()
+        if self.scheduler is not None:
+            self.scheduler.start()
+
+    def stop(self):
+        self.running = False
+        if self.scheduler is not None:
+            self.scheduler.stop()
+        if self.thread is not None:
+            self.thread.join(2.0)
+            self.thread = None
+        if self.pool is not None:
+            self.pool.shutdown(wait=False)
+            self.pool = None
+
+    def _run(self):
+        due = {}          # name -> monotonic time of next poll
+        inflight = {}     # future -> name
+        while self.running:
+            now = time.monotonic()
+            busy = set(inflight.values())
+            boards = dict(self.boards)
+            for name in [n for n in due if n not in boards or not boards[n].is_active()]:
+                # Closed or unregistered: its old slot would look overdue forever
+                del due[name]
+            for name, board in boards.items():
+                if name in busy or not board.is_active():
+                    continue
+                if due.get(name, 0.0) <= now:
+                    due[name] = now + self.period
+                    inflight[self.pool.submit(self._poll, board)] = name
+                    busy.add(name)
+
+            # Only active boards waiting for their next slot decide how long to sleep;
+            # boards still in flight are waited on below
+            next_due = min((t for name, t in due.items() if name not in busy), default=now + self.period)
+            timeout = max(0.0, min(self.period, next_due - time.monotonic()))
+            if inflight:
+                done, _ = wait(list(inflight), timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    inflight.pop(future)
+            else:
+                time.sleep(timeout or 0.01)
+
+    def snapshot(self):
+        """ Aggregated view: {name: {room, type, connected, values, ages, last_poll_age, poll_duration, health}} """
+        now = time.monotonic()
+        result = {}
+        for name, board in list(self.boards.items()):
+            conn = board.connection
+            values = conn.snapshot()
+            result[name] = {
+                "room": board.room,
+                "type": board.kind,
+                "connected": board.is_active(),
+                "values": values,
+                "ages": {field: conn.getAge(field) for field in values},
+                "last_poll_age": None if board.last_poll is None else now - board.last_poll,
+                "poll_duration": board.poll_duration,
+                "health": conn.getHealth(),
+            }
+        return result
+
+    def rooms(self):
+        """ {room: [board names]} """
+        grouped = {}
+        for name, board in self.boards.items():
+            grouped.setdefault(board.room, []).append(name)
+        return grouped
@@ -0,0 +1,184 @@
+"""
+Thin clients of acquisition_daemon.
+
+DaemonClient is the raw HTTP/JSON API. The Remote* classes behave like the
+serial connection classes (same getters, setters, listeners), but "COM port"
+means the board name on the daemon, so the CLIs and the GUI can run on top of
+the daemon without code changes. They take one /snapshot on open() and then
+follow the daemon's /changes long-poll, so an idle client costs the daemon
+one parked request, not a snapshot per poll cycle:
+
+    ac = RemoteAirConditionerSystemConnection("http://127.0.0.1:8765")
+    ac.setComPort("living-ac")
+    ac.open()
+"""
+import json
+import time
+import threading
+from urllib.request import Request, urlopen
+from urllib.parse import quote
+from concurrent.futures import Future
+from smart_home_api import (AirConditionerSystemConnection, CurtainControlSystemConnection,
+                            PortScheduler, PRIORITY_COMMAND)
+
+DEFAULT_URL = "http://127.0.0.1:8765"
+
+
+class DaemonClient:
+    def __init__(self, url=DEFAULT_URL, timeout=5.0):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+
+    def _request(self, path, body=None, timeout=None):
+        data = None if body is None else json.dumps(body).encode()
+        request = Request(self.url + path, data=data, headers={"Content-Type": "application/json"})
+        with urlopen(request, timeout=timeout or self.timeout) as response:
+            return json.loads(response.read())
+
+    def boards(self):
+        return self._request("/boards")["boards"]
+
+    def snapshot(self, board=None):
+        path = "/snapshot" if board is None else "/snapshot?board=" + quote(board)
+        return self._request(path)
+
+    def changes(self, since, timeout=25.0):
+        return self._request(f"/changes?since={since}&timeout={timeout}", timeout=timeout + 5.0)
+
+    def set(self, board, value, confirm=False):
+        return self._request("/set", {"board": board, "value": value, "confirm": confirm})["ok"]
+
+    def subscribe(self, since=None):
+        """ Generator of (board, {field: value}) changes, long-polling forever """
+        if since is None:
+            since = self.snapshot()["version"]
+        while True:
+            result = self.changes(since)
+            since = result["version"]
+            for version, board, changed in result["changes"]:
+                yield board, changed
+
+
+class _RemoteConnection:
+    """ Mixin: replaces the serial transport of a connection class with the daemon """
+    # Seconds one /changes long-poll may wait; bounds how stale the link state can get
+    WATCH_TIMEOUT = 5.0
+
+    def __init__(self, url=DEFAULT_URL):
+        super().__init__()
+        self.client = DaemonClient(url)
+        self.comPort = None
+        self.commands = None     # PortScheduler of POST /set, one per open()
+        self.remoteHealth = {}   # the daemon's supervisor view of the board
+        self.since = 0           # daemon change version the values are current to
+        self.watcher = None      # thread following /changes, one per open()
+
+    def open(self):
+        try:
+            if self.comPort not in self.client.boards():
+                print(f"Connection Error: daemon has no board named {self.comPort}")
+                return False
+        except OSError as e:
+            print(f"Connection Error ({self.client.url}): {e}")
+            return False
+        self.published = {}
+        if not self._load_snapshot():
+            return False
+        self.commands = PortScheduler(f"daemon-{self.comPort}")
+        self.commands.start()
+        self.is_connected = True
+        self.watcher = threading.Thread(target=self._watch, name=f"daemon-watch-{self.comPort}", daemon=True)
+        self.watcher.start()
+        return True
+
+    def close(self):
+        self.is_connected = False
+        self.watcher = None      # the thread leaves after its current long-poll
+        if self.commands is not None:
+            self.commands.stop()
+            self.commands = None
+
+    def update(self):
+        """ Nothing to poll: values arrive from the /changes follower thread """
+
+    def _load_snapshot(self):
+        try:
+            snapshot = self.client.snapshot(self.comPort)
+        except OSError as e:
+            print(f"Update Error ({self.client.url}): {e}")
+            return False
+        board = snapshot["boards"].get(self.comPort)
+        self.since = snapshot["version"]
+        if board is None:
+            return True
+        self.remoteHealth = board.get("health") or {}
+        for field, value in board["values"].items():
+            setattr(self, field, value)
+        self._refreshed(list(board["values"]))
+        return True
+
+    def _watch(self):
+        me = threading.current_thread()
+        while self.is_connected and self.watcher is me:
+            try:
+                result = self.client.changes(self.since, self.WATCH_TIMEOUT)
+            except OSError as e:
+                print(f"Update Error ({self.client.url}): {e}")
+                time.sleep(1.0)
+                # Changes may have been missed meanwhile
+                self._load_snapshot()
+                continue
+            if self.watcher is not me:
+                return
+            if result.get("resync") or result["version"] < self.since:
+                # Fell behind the daemon's backlog, or the daemon restarted
+                self._load_snapshot()
+                continue
+            self.since = result["version"]
+            state = result.get("states", {}).get(self.comPort)
+            if state is not None:
+                self.remoteHealth = dict(self.remoteHealth, state=state)
+            fields = []
+            for version, board, changed in result["changes"]:
+                if board != self.comPort:
+                    continue
+                for field, value in changed.items():
+                    setattr(self, field, value)
+                    fields.append(field)
+            if fields:
+                self._refreshed(list(dict.fromkeys(fields)))
+
+    def getState(self):
+        return self.remoteHealth.get("state", "connected")
+
+    def getHealth(self):
+        return dict(self.remoteHealth)
+
+    def _set_register(self, value, confirm=False, callback=None):
+        # One POST at a time per board, latest-wins like the serial driver: while
+        # a request is in flight only the newest value waits, older futures are
+        # cancelled. Confirmation happens in the daemon, next to the port.
+        commands = self.commands
+        if commands is None:
+            future = Future()
+            future.set_result(False)
+        else:
+            future = commands.submit(lambda: self._post_set(value, confirm), PRIORITY_COMMAND, key="set")
+        if callback is not None:
+            future.add_done_callback(callback)
+        return future
+
+    def _post_set(self, value, confirm):
+        try:
+            return self.client.set(self.comPort, value, confirm)
+        except OSError as e:
+            print(f"Command Error ({self.client.url}): {e}")
+            return False
+
+
+class RemoteAirConditionerSystemConnection(_RemoteConnection, AirConditionerSystemConnection):
+    pass
+
+
+class RemoteCurtainControlSystemConnection(_RemoteConnection, CurtainControlSystemConnection):
+    pass
@@ -0,0 +1,254 @@
+"""
+Terminal dashboard (curses) for every board of a BoardManager.
+
+Polling runs on the manager's threads; the screen is redrawn at `fps` from
+its snapshot, and only cells whose text changed are written. Keys are read
+without blocking:
+
+    Up/Down  select board        s  type a new setpoint for it
+    + / -    nudge the setpoint  q  quit
+    1 2 3    curtain presets (0 / 50 / 100 %)
+
+    python dashboard.py boards.json
+    python dashboard.py --daemon http://127.0.0.1:8765
+
+Windows needs the windows-curses package.
+"""
+import time
+import curses
+import argparse
+from board_manager import BoardManager
+
+# (field, label, format) per board type
+FIELD_FORMATS = {
+    "ac": [("ambientTemperature", "Amb", "{:5.1f}C"),
+           ("desiredTemperature", "Tgt", "{:5.1f}C"),
+           ("fanSpeed", "Fan", "{:3d}rps")],
+    "curtain": [("curtainStatus", "Cur", "{:5.1f}%"),
+                ("outdoorTemperature", "Out", "{:5.1f}C"),
+                ("outdoorPressure", "P", "{:5.0f}"),
+                ("lightIntensity", "Lux", "{:5.1f}")],
+}
+# Setpoint step for +/- and the setter to call, per board type
+SETPOINTS = {
+    "ac": ("desiredTemperature", 0.5, lambda conn, v, cb: conn.setDesiredTemp(v, callback=cb)),
+    "curtain": ("curtainStatus", 10.0, lambda conn, v, cb: conn.setCurtainStatus(v, callback=cb)),
+}
+# One-key setpoints per board type
+PRESETS = {"curtain": {ord("1"): 0.0, ord("2"): 50.0, ord("3"): 100.0}}
+STATE_COLORS = {"connected": 1, "degraded": 2, "reconnecting": 3, "offline": 3, "simulation": 4}
+
+HELP = "Up/Down select  s set  +/- nudge  q quit"
+COL_NAME, COL_STATE, COL_VALUES = 2, 20, 33
+CELL_WIDTH = 12   # one cell per value, so a changed value rewrites only its own cell
+
+
+class Dashboard:
+    def __init__(self, screen, manager, title="SMART HOME", fps=10):
+        self.screen = screen
+        self.manager = manager
+        self.title = title
+        self.fps = fps
+        self.cells = {}          # (row, col) -> (text, attr) currently on screen
+        self.selected = 0
+        self.status = ""
+        self.prompt = None       # text being typed for a setpoint, None when not typing
+        self.running = True
+
+        curses.curs_set(0)
+        screen.timeout(int(1000 / fps))   # getch() waits at most one frame
+        screen.keypad(True)
+        if curses.has_colors():
+            curses.start_color()
+            curses.use_default_colors()
+            for pair, color in ((1, curses.COLOR_GREEN), (2, curses.COLOR_YELLOW),
+                                (3, curses.COLOR_RED), (4, curses.COLOR_BLUE)):
+                curses.init_pair(pair, color, -1)
+
+    # --- drawing ---
+    def _put(self, row, col, text, attr=0):
+        """ Writes text only if that cell shows something else right now """
+        height, width = self.screen.getmaxyx()
+        if row >= height or col >= width:
+            return
+        text = text[:width - col - (1 if row == height - 1 else 0)]
+        old = self.cells.get((row, col))
+        if old == (text, attr):
+            return
+        # Pad over whatever longer text was there before
+        pad = max(0, len(old[0]) - len(text)) if old else 0
+        try:
+            self.screen.addstr(row, col, text + " " * pad, attr)
+        except curses.error:
+            pass
+        self.cells[(row, col)] = (text, attr)
+
+    def _color(self, state):
+        pair = STATE_COLORS.get(state)
+        return curses.color_pair(pair) if pair and curses.has_colors() else 0
+
+    def _rows(self, snapshot):
+        """ [(room, name)] in display order; room rows have name None """
+        rows = []
+        for room, names in sorted(self.manager.rooms().items(), key=lambda item: str(item[0])):
+            rows.append((room, None))
+            rows.extend((room, name) for name in sorted(names) if name in snapshot)
+        return rows
+
+    def _state(self, entry, connection):
+        if getattr(connection, "simulation_mode", False):
+            return "simulation"
+        if not entry["connected"]:
+            return "offline"
+        return (entry.get("health") or {}).get("state", "connected")
+
+    def _values(self, kind, entry):
+        cells = []
+        for field, label, fmt in FIELD_FORMATS.get(kind, ()):
+            value = entry["values"].get(field)
+            cells.append(f"{label} " + ("  -- " if value is None else fmt.format(value)))
+        if entry.get("poll_duration") is not None:
+            cells.append(f"{entry['poll_duration'] * 1000:4.1f}ms")
+        return cells
+
+    def draw(self):
+        snapshot = self.manager.snapshot()
+        rows = self._rows(snapshot)
+        boards = [name for room, name in rows if name is not None]
+        self.selected = min(self.selected, max(0, len(boards) - 1))
+
+        self._put(0, 0, f" {self.title}", curses.A_BOLD)
+        width = self.screen.getmaxyx()[1]
+        self._put(0, max(len(self.title) + 3, width - 10), time.strftime("%H:%M:%S"))
+        self._put(1, 0, " " + HELP, curses.A_DIM)
+        self._put(2, 0, f"  {'BOARD':<{COL_STATE - COL_NAME}}{'STATE':<{COL_VALUES - COL_STATE}}VALUES",
+                  curses.A_UNDERLINE)
+
+        row = 3
+        for room, name in rows:
+            if name is None:
+                self._put(row, 0, f" {room or '(no room)'}", curses.A_BOLD)
+                for col in [c for (r, c) in self.cells if r == row and c > 0]:
+                    self._put(row, col, "")
+            else:
+                entry = snapshot[name]
+                connection = self.manager.get(name)
+                marker = ">" if boards.index(name) == self.selected else " "
+                state = self._state(entry, connection)
+                self._put(row, 0, f"{marker} {name}"[:COL_STATE - 1])
+                self._put(row, COL_STATE, state, self._color(state))
+                for i, cell in enumerate(self._values(entry["type"], entry)):
+                    self._put(row, COL_VALUES + i * CELL_WIDTH, cell)
+            row += 1
+
+        # Rows left over from a board that was unregistered
+        for (r, c) in [key for key in self.cells if key[0] >= row and key[0] < self.screen.getmaxyx()[0] - 1]:
+            self._put(r, c, "")
+
+        bottom = self.screen.getmaxyx()[0] - 1
+        line = f" Setpoint for {self._selected_name(boards)}: {self.prompt}_" if self.prompt is not None else f" {self.status}"
+        self._put(bottom, 0, line, curses.A_REVERSE if self.prompt is not None else 0)
+        self.screen.noutrefresh()
+        curses.doupdate()
+        return boards
+
+    # --- input ---
+    def _selected_name(self, boards):
+        return boards[self.selected] if boards else None
+
+    def _send(self, name, value):
+        board = self.manager.boards.get(name)
+        if board is None or board.kind not in SETPOINTS:
+            return
+        field, step, setter = SETPOINTS[board.kind]
+
+        def done(future):
+            ok = not future.cancelled() and future.exception() is None and future.result()
+            self.status = f"{name}: {value:g} {'sent' if ok else 'FAILED'}"
+        self.status = f"{name}: sending {value:g}..."
+        if setter(board.connection, value, done) is False:
+            self.status = f"{name}: {value:g} is out of range"
+
+    def handle_key(self, key, boards):
+        name = self._selected_name(boards)
+        if self.prompt is not None:
+            if key in (curses.KEY_ENTER, 10, 13):
+                try:
+                    self._send(name, float(self.prompt))
+                except ValueError:
+                    self.status = f"not a number: {self.prompt!r}"
+                self.prompt = None
+            elif key == 27:
+                self.prompt = None
+            elif key in (curses.KEY_BACKSPACE, 127, 8):
+                self.prompt = self.prompt[:-1]
+            elif 0 <= key < 256 and chr(key) in "0123456789.-":
+                self.prompt += chr(key)
+            return
+
+        if key in (ord("q"), ord("Q")):
+            self.running = False
+        elif key == curses.KEY_UP:
+            self.selected = max(0, self.selected - 1)
+        elif key == curses.KEY_DOWN:
+            self.selected = min(len(boards) - 1, self.selected + 1)
+        elif key in (ord("s"), ord("S")) and name is not None:
+            self.prompt = ""
+        elif key in (ord("+"), ord("-")) and name is not None:
+            board = self.manager.boards[name]
+            if board.kind in SETPOINTS:
+                field, step, setter = SETPOINTS[board.kind]
+                current = getattr(board.connection, field)
+                self._send(name, current + (step if key == ord("+") else -step))
+        elif name is not None and key in PRESETS.get(self.manager.boards[name].kind, {}):
+            self._send(name, PRESETS[self.manager.boards[name].kind][key])
+        elif key == curses.KEY_RESIZE:
+            self.cells.clear()
+            self.screen.erase()
+
+    def run(self):
+        while self.running:
+            boards = self.draw()
+            key = self.screen.getch()    # waits up to one frame
+            while key != -1:
+                self.handle_key(key, boards)
+                key = self.screen.getch() if self.running else -1
+
+
+def run_dashboard(manager, title="SMART HOME", fps=10):
+    """ Polls the manager's boards in the background and shows them until 'q' """
+    manager.start()
+    try:
+        curses.wrapper(lambda screen: Dashboard(screen, manager, title, fps).run())
+    finally:
+        manager.close_all()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Smart home terminal dashboard")
+    parser.add_argument("config", nargs="?", help="BoardManager JSON config")
+    parser.add_argument("--daemon", metavar="URL", help="show the boards of an acquisition_daemon instead")
+    parser.add_argument("--fps", type=float, default=10)
+    args = parser.parse_args()
+
+    if args.daemon:
+        from daemon_client import DaemonClient, RemoteAirConditionerSystemConnection, RemoteCurtainControlSystemConnection
+        remote = {"ac": RemoteAirConditionerSystemConnection, "curtain": RemoteCurtainControlSystemConnection}
+        manager = BoardManager(period=0.1)
+        for name, info in DaemonClient(args.daemon).boards().items():
+            connection = remote[info["type"]](args.daemon)
+            connection.setComPort(name)
+            manager.register(name, connection, info["room"], info["type"])
+    elif args.config:
+        manager = BoardManager.from_config(args.config)
+    else:
+        parser.error("give a config file or --daemon URL")
+
+    for name, ok in manager.open_all().items():
+        if not ok:
+            print(f"[!] {name}: could not connect")
+    run_dashboard(manager, fps=args.fps)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+"""
+Seeded, vectorized simulation of many virtual boards.
+
+Every board's state lives in NumPy arrays and one step() advances the whole
+fleet, so a single process can drive thousands of simulated connections
+(set_simulation_mode(True, fleet)) for load tests of the GUI, daemon and
+rules without hardware.
+
+Models (per board, parameters drawn from the seed):
+  AC       ambient drifts toward the room's environment temperature and is
+           pulled down by the fan; fan = 2 * (ambient int - desired int), 0..99
+           as in the firmware
+  Curtain  position travels toward the target at a fixed %/s; outdoor
+           temperature and light follow daily curves, pressure (raw BMP180
+           counts, as the firmware reports it) random-walks
+
+    fleet = SimulatedFleet(seed=1, speed=60)      # one simulated minute per second
+    conn = AirConditionerSystemConnection()
+    conn.set_simulation_mode(True, fleet)
+
+    python fleet_sim.py --boards 5000 --seconds 10
+    python fleet_sim.py --boards 500 --write-config fleet.json   # BoardManager / daemon config
+"""
+import json
+import math
+import time
+import argparse
+import threading
+import numpy as np
+
+DAY = 86400.0
+START = 1717228800.0    # 2024-06-01 08:00 UTC: a fixed, sunny start, so seeded runs repeat
+
+
+class SimulatedFleet:
+    """
+    `speed` simulated seconds pass per wall-clock second. The fleet only
+    ever advances in fixed steps of `dt` simulated seconds (default: what
+    `min_step` wall seconds are worth, at least 0.1 s), so a seed gives the
+    same states at the same simulated times however often, and from however
+    many threads, sync() is called. Simulated time starts at `start` (unix
+    time, UTC days), not at the wall clock.
+    """
+    def __init__(self, seed=0, speed=1.0, start=START, min_step=0.05, capacity=64, dt=None):
+        self.rng = np.random.default_rng(seed)
+        self.speed = speed
+        self.min_step = min_step
+        self.dt = max(0.1, min_step * speed) if dt is None else dt
+        self.lock = threading.Lock()
+        self.sim_time = start     # unix time inside the simulation
+        self.wall = time.monotonic()
+        self.steps = 0
+
+        self.n_ac = 0
+        self.ac_ambient = np.zeros(capacity)
+        self.ac_desired = np.zeros(capacity)
+        self.ac_fan = np.zeros(capacity, dtype=np.int64)
+        self.ac_env_offset = np.zeros(capacity)    # room warmer/colder than outside
+        self.ac_tau = np.zeros(capacity)           # s, room towards environment
+        self.ac_cooling = np.zeros(capacity)       # degC/s at full fan
+
+        self.n_cur = 0
+        self.cur_position = np.zeros(capacity)
+        self.cur_target = np.zeros(capacity)
+        self.cur_rate = np.zeros(capacity)         # %/s travel
+        self.cur_temp_mean = np.zeros(capacity)
+        self.cur_temp_amp = np.zeros(capacity)
+        self.cur_light_peak = np.zeros(capacity)
+        self.cur_phase = np.zeros(capacity)        # s, local sun offset
+        self.cur_pressure = np.zeros(capacity)     # raw BMP180 counts
+        self.cur_outdoor = np.zeros(capacity)
+        self.cur_light = np.zeros(capacity)
+
+    # --- fleet building ---
+    def _grow(self, prefix, count):
+        for name in [n for n in vars(self) if n.startswith(prefix)]:
+            arr = getattr(self, name)
+            if isinstance(arr, np.ndarray) and len(arr) < count:
+                grown = np.zeros(max(count, 2 * len(arr)), dtype=arr.dtype)
+                grown[:len(arr)] = arr
+                setattr(self, name, grown)
+
+    def add_ac(self, ambient=None, desired=25.0):
+        with self.lock:
+            i = self.n_ac
+            self._grow("ac_", i + 1)
+            self.n_ac += 1
+            self.ac_env_offset[i] = self.rng.normal(4.0, 1.5)
+            self.ac_ambient[i] = self.rng.normal(24.0, 2.0) if ambient is None else ambient
+            self.ac_desired[i] = desired
+            self.ac_tau[i] = self.rng.uniform(1200.0, 3600.0)
+            self.ac_cooling[i] = self.rng.uniform(0.005, 0.02)
+            self._ac_fan(slice(i, i + 1))
+            return i
+
+    def add_curtain(self, position=0.0):
+        with self.lock:
+            i = self.n_cur
+            self._grow("cur_", i + 1)
+            self.n_cur += 1
+            self.cur_position[i] = self.cur_target[i] = position
+            self.cur_rate[i] = self.rng.uniform(5.0, 15.0)
+            self.cur_temp_mean[i] = self.rng.normal(18.0, 4.0)
+            self.cur_temp_amp[i] = self.rng.uniform(3.0, 8.0)
+            self.cur_light_peak[i] = self.rng.uniform(150.0, 255.0)
+            self.cur_phase[i] = self.rng.normal(0.0, 1800.0)
+            self.cur_pressure[i] = self.rng.normal(23843.0, 150.0)
+            self._curves(slice(i, i + 1))
+            return i
+
+    # --- physics ---
+    def _day_fraction(self, sl):
+        """ 0..1 through the local day (0 = midnight) for the curtains in sl """
+        local = (self.sim_time + self.cur_phase[sl]) % DAY
+        return local / DAY
+
+    def _curves(self, sl):
+        day = self._day_fraction(sl)
+        # Warmest mid-afternoon (15:00), coldest before dawn
+        self.cur_outdoor[sl] = self.cur_temp_mean[sl] + self.cur_temp_amp[sl] * np.cos(2 * np.pi * (day - 0.625))
+        # Daylight 06:00-18:00, peak at noon
+        sun = np.sin(np.pi * (day - 0.25) / 0.5)
+        self.cur_light[sl] = np.where((day > 0.25) & (day < 0.75), self.cur_light_peak[sl] * sun, 0.0)
+
+    def _ac_fan(self, sl):
+        fan = 2 * (np.floor(self.ac_ambient[sl]) - np.floor(self.ac_desired[sl]))
+        self.ac_fan[sl] = np.clip(fan, 0, 99).astype(np.int64)
+
+    def step(self, dt):
+        """ Advances every board by dt simulated seconds """
+        with self.lock:
+            self._step(dt)
+
+    def _step(self, dt):
+        self.sim_time += dt
+        self.steps += 1
+        if self.n_cur:
+            c = slice(0, self.n_cur)
+            travel = self.cur_rate[c] * dt
+            self.cur_position[c] += np.clip(self.cur_target[c] - self.cur_position[c], -travel, travel)
+            self.cur_pressure[c] += self.rng.normal(0.0, 0.5 * math.sqrt(dt), self.n_cur)
+            np.clip(self.cur_pressure[c], 0.0, 65535.0, out=self.cur_pressure[c])
+            self._curves(c)
+        if self.n_ac:
+            a = slice(0, self.n_ac)
+            # Rooms follow the outdoor curve of the first curtain (or a fixed 22 C) plus their own offset
+            outside = self.cur_outdoor[0] if self.n_cur else 22.0
+            env = outside + self.ac_env_offset[a]
+            decay = 1.0 - np.exp(-dt / self.ac_tau[a])
+            self.ac_ambient[a] += (env - self.ac_ambient[a]) * decay
+            self.ac_ambient[a] -= self.ac_cooling[a] * (self.ac_fan[a] / 99.0) * dt
+            self.ac_ambient[a] += self.rng.normal(0.0, 0.01 * math.sqrt(dt), self.n_ac)
+            np.clip(self.ac_ambient[a], 0.0, 63.9, out=self.ac_ambient[a])
+            self._ac_fan(a)
+
+    def sync(self):
+        """ Steps to the current wall clock (shared by all boards, cheap when called often) """
+        with self.lock:
+            steps = int((time.monotonic() - self.wall) * self.speed / self.dt)
+            if steps <= 0:
+                return
+            # The remainder stays on the clock for the next sync, so no time is lost or gained
+            self.wall += steps * self.dt / self.speed
+            for _ in range(steps):
+                self._step(self.dt)
+
+    # --- board access (values as the firmware reports them) ---
+    def set_ac_target(self, i, value):
+        with self.lock:
+            self.ac_desired[i] = value
+            self._ac_fan(slice(i, i + 1))
+
+    def set_curtain_target(self, i, value):
+        with self.lock:
+            self.cur_target[i] = value
+
+    def read_ac(self, i):
+        with self.lock:
+            return {"desiredTemperature": round(float(self.ac_desired[i]), 1),
+                    "ambientTemperature": round(float(self.ac_ambient[i]), 1),
+                    "fanSpeed": int(self.ac_fan[i])}
+
+    def read_curtain(self, i):
+        with self.lock:
+            return {"curtainStatus": round(float(self.cur_position[i]), 1),
+                    "outdoorTemperature": round(float(max(0.0, self.cur_outdoor[i])), 1),
+                    "outdoorPressure": int(self.cur_pressure[i]),
+                    "lightIntensity": float(int(self.cur_light[i]))}
+
+    # --- by board type ("ac" / "curtain", as in BOARD_KIND) ---
+    def add(self, kind):
+        return {"ac": self.add_ac, "curtain": self.add_curtain}[kind]()
+
+    def read(self, kind, i):
+        return {"ac": self.read_ac, "curtain": self.read_curtain}[kind](i)
+
+    def set_target(self, kind, i, value):
+        {"ac": self.set_ac_target, "curtain": self.set_curtain_target}[kind](i, value)
+
+
+_default = None
+_default_lock = threading.Lock()
+
+def default_fleet():
+    """ Fleet shared by connections switched to simulation without one of their own """
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = SimulatedFleet(seed=0)
+        return _default
+
+
+def _bench(boards, seconds, speed, seed):
+    from smart_home_api import AirConditionerSystemConnection, CurtainControlSystemConnection
+    fleet = SimulatedFleet(seed=seed, speed=speed, min_step=0.0)
+    conns = []
+    for i in range(boards):
+        conn = AirConditionerSystemConnection() if i % 2 == 0 else CurtainControlSystemConnection()
+        conn.set_simulation_mode(True, fleet)
+        conns.append(conn)
+    steps = updates = 0
+    started = time.perf_counter()
+    step_time = 0.0
+    while time.perf_counter() - started < seconds:
+        t = time.perf_counter()
+        fleet.step(0.1 * speed)
+        step_time += time.perf_counter() - t
+        steps += 1
+        for conn in conns:
+            conn._simulate(sync=False)
+        updates += len(conns)
+    elapsed = time.perf_counter() - started
+    print(f"{boards} boards: {steps} fleet steps ({step_time / steps * 1e6:.0f} us each), "
+          f"{updates / elapsed:.0f} board updates/s")
+    print("first AC:", conns[0].snapshot())
+    if boards > 1:
+        print("first curtain:", conns[1].snapshot())
+
+
+def _write_config(path, boards, seed, speed):
+    config = {"period": 0.5, "workers": 16, "simulation_seed": seed, "simulation_speed": speed, "boards": []}
+    for i in range(boards):
+        room = f"Room {i // 2 + 1:04d}"
+        kind = "ac" if i % 2 == 0 else "curtain"
+        config["boards"].append({"name": f"{kind}-{i // 2 + 1:04d}", "room": room, "type": kind,
+                                 "port": "SIM", "simulation": True})
+    with open(path, "w") as f:
+        json.dump(config, f, indent=1)
+    print(f"wrote {boards} simulated boards to {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Virtual board fleet")
+    parser.add_argument("--boards", type=int, default=1000)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--speed", type=float, default=60.0, help="simulated seconds per wall second")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--write-config", metavar="PATH", help="write a BoardManager config instead of benchmarking")
+    args = parser.parse_args()
+    if args.write_config:
+        _write_config(args.write_config, args.boards, args.seed, args.speed)
+    else:
+        _bench(args.boards, args.seconds, args.speed, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,10 @@ import tkinter as tk
 from tkinter import ttk, messagebox
 import threading
 import time
-from smart_home_api import AirConditionerSystemConnection, CurtainControlSystemConnection
+import argparse
+from smart_home_api import AirConditionerSystemConnection, CurtainControlSystemConnection, discover_boards
+from sensor_history import attach_history
+from trend_chart import TrendChart
 
 # --- DEFAULTS ---
 DEFAULT_PORT_KLIMA = "COM7"
@@ -27,17 +30,33 @@ FONT_NORMAL = ("Montserrat", 9)
 FONT_MONITOR_LABEL = ("Montserrat", 9, "bold")
 FONT_MONITOR_VAL = ("Montserrat", 10)
 
+# Value changes are collected and drawn at most once per frame
+FRAME_MS = 50
+# A curtain drag is sent once the slider has rested this long (or on release)
+CURTAIN_SETTLE_MS = 250
+
+# Trend charts: rows kept per field (only changes and keyframes cost rows, ~1 MB)
+HISTORY_CAPACITY = 262144
+ZOOM_LEVELS = [("1 min", 60), ("10 min", 600), ("1 h", 3600), ("24 h", 86400)]
+
 class HomeAutomationGUI:
-    def __init__(self, root):
+    def __init__(self, root, daemon_url=None):
         self.root = root
         self.root.title("Control Panel")
-        self.root.geometry("850x500")
+        self.root.geometry("850x780")
         self.root.configure(bg=COLOR_BG_MAIN)
         self.root.resizable(False, False)
 
-        # API Objects
-        self.klima = AirConditionerSystemConnection()
-        self.perde = CurtainControlSystemConnection()
+        # API Objects (with a daemon, the "COM Port" fields take board names)
+        if daemon_url:
+            from daemon_client import RemoteAirConditionerSystemConnection, RemoteCurtainControlSystemConnection
+            self.klima = RemoteAirConditionerSystemConnection(daemon_url)
+            self.perde = RemoteCurtainControlSystemConnection(daemon_url)
+        else:
+            self.klima = AirConditionerSystemConnection()
+            self.perde = CurtainControlSystemConnection()
+        self.history = {self.klima: attach_history(self.klima, HISTORY_CAPACITY),
+                        self.perde: attach_history(self.perde, HISTORY_CAPACITY)}
         
         # Thread Control
         self.running = True
@@ -46,6 +65,17 @@ class HomeAutomationGUI:
         # Styling and Layout
         self.configure_styles()
         self.create_widgets()
+        self.create_monitor_map()
+        self.create_chart_panel()
+
+        # Change-driven refresh: boards report changed fields, Tk redraws only those
+        self.dirty = set()
+        self.samples = []
+        self.dirty_lock = threading.Lock()
+        self.flush_pending = False
+        for board in (self.klima, self.perde):
+            board.addChangeListener(self.on_board_change)
+            board.addSampleListener(self.on_board_sample)
         
         # Start Thread
         self.thread.start()
@@ -106,6 +136,7 @@ class HomeAutomationGUI:
         ttk.Entry(conn_frame1, textvariable=self.port_klima_var, width=10).pack(side=tk.LEFT, padx=(0,10))
         self.btn_conn_klima = ttk.Button(conn_frame1, text="Connect", style="Connect.TButton", command=self.toggle_klima_conn)
         self.btn_conn_klima.pack(side=tk.LEFT)
+        ttk.Button(conn_frame1, text="Auto", width=5, command=self.auto_detect).pack(side=tk.LEFT, padx=(5,0))
 
         # Monitor Area
         self.create_separator(left_frame)
@@ -138,6 +169,7 @@ class HomeAutomationGUI:
         ttk.Entry(conn_frame2, textvariable=self.port_perde_var, width=10).pack(side=tk.LEFT, padx=(0,10))
         self.btn_conn_perde = ttk.Button(conn_frame2, text="Connect", style="Connect.TButton", command=self.toggle_perde_conn)
         self.btn_conn_perde.pack(side=tk.LEFT)
+        ttk.Button(conn_frame2, text="Auto", width=5, command=self.auto_detect).pack(side=tk.LEFT, padx=(5,0))
         
         # Checkbox for Simulation
         self.sim_mode_var = tk.BooleanVar(value=False)
@@ -149,7 +181,7 @@ class HomeAutomationGUI:
         # Monitor Area
         self.create_separator(right_frame)
         self.lbl_out_temp = self.create_monitor_row(right_frame, "Outdoor Temperature:", "--.- °C")
-        self.lbl_out_pres = self.create_monitor_row(right_frame, "Pressure:", "--.- hPa")
+        self.lbl_out_pres = self.create_monitor_row(right_frame, "Pressure:", "-- raw")
         self.lbl_light = self.create_monitor_row(right_frame, "Light Intensity:", "--.- Lux")
         self.lbl_curtain = self.create_monitor_row(right_frame, "Curtain Status:", "--.- %")
         self.create_separator(right_frame)
@@ -159,8 +191,11 @@ class HomeAutomationGUI:
         ctrl_frame2.pack(fill=tk.X, pady=10)
         ttk.Label(ctrl_frame2, text="Manual Curtain Control (%):", style="Normal.TLabel").pack(anchor=tk.W, pady=(0,5))
         
-        self.scale_curtain = ttk.Scale(ctrl_frame2, from_=0, to=100, orient=tk.HORIZONTAL, style="Horizontal.TScale")
+        self.curtain_drag_job = None   # pending after() of a slider drag
+        self.scale_curtain = ttk.Scale(ctrl_frame2, from_=0, to=100, orient=tk.HORIZONTAL, style="Horizontal.TScale",
+                                       command=self.on_curtain_drag)
         self.scale_curtain.pack(fill=tk.X, pady=(0,10))
+        self.scale_curtain.bind("<ButtonRelease-1>", lambda event: self.send_curtain_drag())
         ttk.Button(ctrl_frame2, text="Move Curtain", style="Action.TButton", command=self.send_perde_cmd).pack(fill=tk.X)
 
         # --- STATUS BAR ---
@@ -175,6 +210,61 @@ class HomeAutomationGUI:
         lbl_val.pack(side=tk.RIGHT)
         return lbl_val
 
+    def create_monitor_map(self):
+        # (connection, field) -> (label, format, placeholder, color when live, color when offline)
+        self.monitors = {
+            (self.klima, "ambientTemperature"): (self.lbl_amb_temp, "{:.1f} °C", "--.- °C", "#2C3E50", COLOR_TEXT_LIGHT),
+            (self.klima, "desiredTemperature"): (self.lbl_des_temp, "{:.1f} °C", "--.- °C", COLOR_SUCCESS, COLOR_TEXT_LIGHT),
+            (self.klima, "fanSpeed"):           (self.lbl_fan_speed, "{} rps", "-- rps", None, None),
+            (self.perde, "outdoorTemperature"): (self.lbl_out_temp, "{:.1f} °C", "--.- °C", None, None),
+            (self.perde, "outdoorPressure"):    (self.lbl_out_pres, "{:.0f} raw", "-- raw", None, None),
+            (self.perde, "lightIntensity"):     (self.lbl_light, "{:.1f} Lux", "--.- Lux", None, None),
+            (self.perde, "curtainStatus"):      (self.lbl_curtain, "{:.1f} %", "--.- %", None, None),
+        }
+        self.shown = {}   # key -> (text, color) currently on screen
+
+    def create_chart_panel(self):
+        chart_frame = ttk.LabelFrame(self.root, text=" Trends ", style="Panel.TLabelframe", padding=(15, 5))
+        chart_frame.pack(side=tk.BOTTOM, fill=tk.X, padx=15, pady=(0, 10))
+
+        zoom_frame = ttk.Frame(chart_frame, style="Panel.TFrame")
+        zoom_frame.grid(row=0, column=0, columnspan=2, sticky=tk.W)
+        ttk.Label(zoom_frame, text="Window:", style="Normal.TLabel").pack(side=tk.LEFT, padx=(0, 5))
+        self.zoom_var = tk.IntVar(value=ZOOM_LEVELS[0][1])
+        for text, seconds in ZOOM_LEVELS:
+            tk.Radiobutton(zoom_frame, text=text, value=seconds, variable=self.zoom_var, command=self.set_zoom,
+                           bg=COLOR_BG_PANEL, activebackground=COLOR_BG_PANEL, font=FONT_NORMAL).pack(side=tk.LEFT)
+
+        # title, y range, [(board, field, color)]
+        layout = [
+            ("Temperature (°C)  ambient / target", 10, 50,
+             [(self.klima, "ambientTemperature", "#C0392B"), (self.klima, "desiredTemperature", COLOR_SUCCESS)]),
+            ("Fan Speed (rps)", 0, 100, [(self.klima, "fanSpeed", COLOR_BUTTON)]),
+            ("Light Intensity (Lux)", 0, 255, [(self.perde, "lightIntensity", "#D4AC0D")]),
+            ("Curtain Status (%)", 0, 100, [(self.perde, "curtainStatus", COLOR_ACCENT)]),
+        ]
+        self.charts = {}   # (board, field) -> chart
+        for i, (title, y_min, y_max, series) in enumerate(layout):
+            cell = ttk.Frame(chart_frame, style="Panel.TFrame")
+            cell.grid(row=1 + i // 2, column=i % 2, padx=5, pady=2, sticky=tk.W)
+            ttk.Label(cell, text=title, style="MonitorTitle.TLabel").pack(anchor=tk.W)
+            chart = TrendChart(cell, y_min, y_max, window=self.zoom_var.get(), width=385, height=85,
+                               highlightthickness=1, highlightbackground=COLOR_BORDER)
+            chart.pack()
+            chart.set_provider(self.history_provider)
+            for board, field, color in series:
+                chart.add_series((board, field), color)
+                self.charts[(board, field)] = chart
+
+    def history_provider(self, key, t0, t1, buckets):
+        board, field = key
+        return self.history[board].downsample(field, t0, t1, buckets)
+
+    def set_zoom(self):
+        now = time.time()
+        for chart in set(self.charts.values()):
+            chart.set_window(self.zoom_var.get(), now)
+
     def create_separator(self, parent):
         sep = ttk.Separator(parent, orient="horizontal")
         sep.pack(fill=tk.X, pady=8)
@@ -194,6 +284,7 @@ class HomeAutomationGUI:
             self.btn_conn_klima.config(text="Connect")
             self.style_disconnected(self.btn_conn_klima)
             self.status_bar.config(text="AC Unit Disconnected", fg="black")
+        self.refresh_board(self.klima)
 
     def toggle_perde_conn(self):
         if self.sim_mode_var.get(): return 
@@ -211,6 +302,7 @@ class HomeAutomationGUI:
             self.btn_conn_perde.config(text="Connect")
             self.style_disconnected(self.btn_conn_perde)
             self.status_bar.config(text="Curtain System Disconnected", fg="black")
+        self.refresh_board(self.perde)
 
     def style_connected(self, btn):
         # Buton stilini dinamik olarak yesil yap (ttk style map ile ugrasmamak icin kucuk bir hack)
@@ -221,6 +313,35 @@ class HomeAutomationGUI:
     def style_disconnected(self, btn):
         pass
 
+    def auto_detect(self):
+        # Probes every port at once on a worker thread, fills in the port fields
+        self.status_bar.config(text="Searching for boards...", fg="black")
+        threading.Thread(target=self.detect_boards, daemon=True).start()
+
+    def detect_boards(self):
+        if hasattr(self.klima, "client"):
+            # Daemon mode: the "ports" are the daemon's board names
+            try:
+                found = [(name, info["type"]) for name, info in self.klima.client.boards().items()]
+            except OSError:
+                found = []
+        else:
+            busy = [b.comPort for b in (self.klima, self.perde) if b.is_connected]
+            found = list(discover_boards(exclude=busy))
+        self.root.after(0, self.apply_detected, found)
+
+    def apply_detected(self, found):
+        found = dict((kind, port) for port, kind in reversed(found))   # first hit per kind wins
+        if "ac" in found and not self.klima.is_connected:
+            self.port_klima_var.set(found["ac"])
+        if "curtain" in found and not self.perde.is_connected:
+            self.port_perde_var.set(found["curtain"])
+        if found:
+            text = ", ".join(f"{kind} on {port}" for kind, port in sorted(found.items()))
+            self.status_bar.config(text=f"Found: {text}", fg="green")
+        else:
+            self.status_bar.config(text="No boards found", fg="red")
+
     def toggle_sim_mode(self):
         is_sim = self.sim_mode_var.get()
         self.perde.set_simulation_mode(is_sim)
@@ -234,23 +355,54 @@ class HomeAutomationGUI:
         else:
             self.btn_conn_perde.config(state=tk.NORMAL)
             self.status_bar.config(text="Simulation Mode Deactivated", fg="black")
+        self.refresh_board(self.perde)
 
     def send_klima_cmd(self):
         try:
             val = float(self.entry_set_temp.get())
-            if self.klima.setDesiredTemp(val):
-                self.status_bar.config(text=f"Command Sent: Set AC Target to {val}°C", fg="black")
-            else:
-                messagebox.showwarning("Invalid Range", "Temperature must be between 10.0 and 50.0")
         except ValueError:
             messagebox.showerror("Invalid Input", "Please enter a numeric value.")
+            return
+        if not (10.0 <= val <= 50.0):
+            messagebox.showwarning("Invalid Range", "Temperature must be between 10.0 and 50.0")
+            return
+        # The outcome (sent and read back, or not) arrives through report_command
+        self.status_bar.config(text=f"Sending: Set AC Target to {val}°C ...", fg="black")
+        self.klima.setDesiredTemp(val, confirm=True, callback=self.command_callback("AC target"))
 
     def send_perde_cmd(self):
         val = self.scale_curtain.get()
-        self.perde.setCurtainStatus(val)
-        self.status_bar.config(text=f"Command Sent: Set Curtain to {val:.1f}%", fg="black")
+        self.status_bar.config(text=f"Sending: Set Curtain to {val:.1f}% ...", fg="black")
+        self.perde.setCurtainStatus(val, confirm=True, callback=self.command_callback("Curtain"))
+
+    def on_curtain_drag(self, value):
+        # Motion events only restart the timer: a whole drag costs one setpoint
+        if self.curtain_drag_job is not None:
+            self.root.after_cancel(self.curtain_drag_job)
+        self.curtain_drag_job = self.root.after(CURTAIN_SETTLE_MS, self.send_curtain_drag)
+
+    def send_curtain_drag(self):
+        if self.curtain_drag_job is None:
+            return   # nothing moved since the last send
+        self.root.after_cancel(self.curtain_drag_job)
+        self.curtain_drag_job = None
+        if self.perde.is_connected or self.perde.simulation_mode:
+            self.perde.setCurtainStatus(float(self.scale_curtain.get()))
+
+    def command_callback(self, name):
+        # Future callbacks run on the port thread, hand the result to Tk
+        return lambda future: self.root.after(0, self.report_command, name, future)
+
+    def report_command(self, name, future):
+        if future.cancelled():
+            return  # superseded by a newer value
+        if future.exception() is None and future.result():
+            self.status_bar.config(text=f"{name} confirmed by board", fg="green")
+        else:
+            self.status_bar.config(text=f"{name} NOT confirmed by board", fg="red")
 
     def update_loop(self):
+        states = {}
         while self.running:
             try:
                 if self.klima.is_connected:
@@ -259,31 +411,79 @@ class HomeAutomationGUI:
                 if self.perde.is_connected or self.perde.simulation_mode:
                     self.perde.update()
 
-                self.root.after(0, self.update_gui_elements)
-                time.sleep(0.5)
+                for name, board in (("AC Unit", self.klima), ("Curtain System", self.perde)):
+                    state = board.getState() if board.is_connected else None
+                    previous = states.get(name)
+                    if state != previous:
+                        states[name] = state
+                        # The connect button already reported a fresh connection
+                        if state is not None and (previous is not None or state != "connected"):
+                            self.root.after(0, self.report_state, name, state)
             except Exception as e:
                 print(f"Update Error: {e}")
-
-    def update_gui_elements(self):
-        # Update AC
-        if self.klima.is_connected:
-            self.lbl_amb_temp.config(text=f"{self.klima.getAmbientTemp():.1f} °C", foreground="#2C3E50")
-            self.lbl_des_temp.config(text=f"{self.klima.getDesiredTemp():.1f} °C", foreground=COLOR_SUCCESS)
-            self.lbl_fan_speed.config(text=f"{self.klima.getFanSpeed()} rps")
-        else:
-            self.lbl_amb_temp.config(text="--.- °C", foreground=COLOR_TEXT_LIGHT)
-            self.lbl_des_temp.config(text="--.- °C", foreground=COLOR_TEXT_LIGHT)
-
-        # Update Curtain/Sensor
-        if self.perde.is_connected or self.perde.simulation_mode:
-            self.lbl_out_temp.config(text=f"{self.perde.getOutdoorTemp():.1f} °C")
-            self.lbl_out_pres.config(text=f"{self.perde.getOutdoorPress():.1f} hPa")
-            self.lbl_light.config(text=f"{self.perde.getLightIntensity():.1f} Lux")
-            self.lbl_curtain.config(text=f"{self.perde.getCurtainStatus():.1f} %")
-        else:
-            self.lbl_out_temp.config(text="--.- °C")
+            # Also after an error, otherwise a recurring one spins this thread
+            time.sleep(0.5)
+
+    def report_state(self, name, state):
+        colors = {"connected": "green", "degraded": "#B7950B", "reconnecting": "red"}
+        self.status_bar.config(text=f"{name}: link {state}", fg=colors.get(state, "black"))
+
+    def on_board_change(self, connection, changed):
+        # Runs on the polling/port threads: only record what changed
+        with self.dirty_lock:
+            self.dirty.update((connection, field) for field in changed)
+            self.schedule_flush()
+
+    def on_board_sample(self, connection, timestamp, values):
+        # Charts want every sample (min/max per column), not just changes
+        with self.dirty_lock:
+            self.samples.append((connection, timestamp, values))
+            self.schedule_flush()
+
+    def schedule_flush(self):
+        # Caller holds dirty_lock
+        if self.flush_pending:
+            return
+        self.flush_pending = True
+        self.root.after(FRAME_MS, self.flush_changes)
+
+    def flush_changes(self):
+        with self.dirty_lock:
+            keys, self.dirty = self.dirty, set()
+            samples, self.samples = self.samples, []
+            self.flush_pending = False
+        self.refresh_monitors(keys)
+        for connection, timestamp, values in samples:
+            for field, value in values.items():
+                chart = self.charts.get((connection, field))
+                if chart is not None:
+                    chart.add_sample((connection, field), timestamp, value)
+
+    def refresh_board(self, connection):
+        self.refresh_monitors([key for key in self.monitors if key[0] is connection])
+
+    def refresh_monitors(self, keys):
+        for key in keys:
+            if key not in self.monitors:
+                continue
+            connection, field = key
+            label, fmt, placeholder, live_color, offline_color = self.monitors[key]
+            if connection.is_connected or getattr(connection, "simulation_mode", False):
+                text, color = fmt.format(getattr(connection, field)), live_color
+            else:
+                text, color = placeholder, offline_color
+            if self.shown.get(key) == (text, color):
+                continue
+            self.shown[key] = (text, color)
+            if color is None:
+                label.config(text=text)
+            else:
+                label.config(text=text, foreground=color)
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Smart home control panel")
+    parser.add_argument("--daemon", metavar="URL", help="run on top of acquisition_daemon instead of the COM ports")
+    args = parser.parse_args()
     root = tk.Tk()
-    app = HomeAutomationGUI(root)
+    app = HomeAutomationGUI(root, args.daemon)
     root.mainloop()
\ No newline at end of file
@@ -0,0 +1,190 @@
+"""
+Serial link instrumentation.
+
+Off by default: a connection only pays an `is None` check per transfer until
+enableStats() attaches a LinkStats. Then it counts bytes, timeouts and bad
+replies per GET opcode, and keeps round-trip and poll-cycle histograms.
+Round trips only come from windows the driver kept; windows it threw away
+(short, garbled or trailed by stray bytes) are counted apart.
+
+    stats = connection.enableStats()
+    ...
+    stats.snapshot()                                   # plain dict
+    render_prometheus({"living-ac": connection})       # text exposition format
+"""
+import bisect
+import threading
+
+# Histogram upper bounds, seconds (a 9600 baud byte is ~1 ms on the wire)
+LATENCY_BUCKETS = (0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0)
+
+
+class Histogram:
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)   # last slot: above every bound
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        """ Upper bound of the bucket holding the q-quantile (None if empty) """
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(self.bounds + (float("inf"),), self.counts):
+            seen += n
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def snapshot(self):
+        return {"count": self.count, "sum": self.sum,
+                "buckets": dict(zip([*map(str, self.bounds), "+Inf"], self.counts)),
+                "p50": self.quantile(0.5), "p99": self.quantile(0.99)}
+
+
+class _OpcodeStats:
+    __slots__ = ("requests", "timeouts", "bad", "rtt")
+
+    def __init__(self):
+        self.requests = 0
+        self.timeouts = 0    # no reply within the read timeout
+        self.bad = 0         # a reply that can't be right (frac digit > 9, out of range)
+        self.rtt = Histogram()
+
+
+class LinkStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.errors = 0          # serial / OS errors on the port
+        self.discarded = 0       # GET windows dropped by the driver's checks
+        self.opcodes = {}
+        self.poll = Histogram()
+
+    def _opcode(self, op):
+        stats = self.opcodes.get(op)
+        if stats is None:
+            stats = self.opcodes[op] = _OpcodeStats()
+        return stats
+
+    def on_window(self, chunk, data, rtt, bad_ops=(), accepted=True):
+        """
+        One GET window: opcodes written, reply bytes received, seconds it took,
+        and whether the driver kept the replies (rtt is only observed then)
+        """
+        with self.lock:
+            self.bytes_sent += len(chunk)
+            self.bytes_received += len(data)
+            if not accepted:
+                self.discarded += 1
+            for i, op in enumerate(chunk):
+                stats = self._opcode(op)
+                stats.requests += 1
+                if i >= len(data):
+                    stats.timeouts += 1
+                elif op in bad_ops:
+                    stats.bad += 1
+                elif accepted:
+                    stats.rtt.observe(rtt)
+
+    def on_bad(self, op):
+        """ A reply that passed the window checks but not the register's plausibility range """
+        with self.lock:
+            self._opcode(op).bad += 1
+
+    def on_sent(self, count=1):
+        with self.lock:
+            self.bytes_sent += count
+
+    def on_error(self):
+        with self.lock:
+            self.errors += 1
+
+    def on_poll(self, seconds):
+        with self.lock:
+            self.poll.observe(seconds)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "bytes_sent": self.bytes_sent,
+                "bytes_received": self.bytes_received,
+                "errors": self.errors,
+                "windows_discarded": self.discarded,
+                "opcodes": {f"0x{op:02X}": {"requests": s.requests, "timeouts": s.timeouts,
+                                            "bad": s.bad, "rtt": s.rtt.snapshot()}
+                            for op, s in sorted(self.opcodes.items())},
+                "poll": self.poll.snapshot(),
+            }
+
+
+def _labels(**labels):
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels.items()) + "}"
+
+
+def _histogram_lines(name, hist, **labels):
+    lines = []
+    cumulative = 0
+    for bound, n in zip([*map(str, hist.bounds), "+Inf"], hist.counts):
+        cumulative += n
+        lines.append(f"{name}_bucket{_labels(**labels, le=bound)} {cumulative}")
+    lines.append(f"{name}_sum{_labels(**labels)} {hist.sum}")
+    lines.append(f"{name}_count{_labels(**labels)} {hist.count}")
+    return lines
+
+
+def render_prometheus(connections):
+    """ Prometheus text exposition for {board name: connection} """
+    out = {}   # metric name -> (type, help, [lines])
+
+    def add(name, kind, help_text, lines):
+        out.setdefault(name, (kind, help_text, []))[2].extend(lines)
+
+    for board, conn in connections.items():
+        health = conn.getHealth()
+        if "state" in health:
+            for state in ("connected", "degraded", "reconnecting", "disconnected"):
+                add("smarthome_link_state", "gauge", "1 for the current link state",
+                    [f"smarthome_link_state{_labels(board=board, state=state)} {int(health['state'] == state)}"])
+            add("smarthome_reconnects_total", "counter", "Successful reconnects",
+                [f"smarthome_reconnects_total{_labels(board=board)} {health['reconnects']}"])
+
+        stats = getattr(conn, "stats", None)
+        if stats is None:
+            continue
+        with stats.lock:
+            add("smarthome_bytes_sent_total", "counter", "Bytes written to the board",
+                [f"smarthome_bytes_sent_total{_labels(board=board)} {stats.bytes_sent}"])
+            add("smarthome_bytes_received_total", "counter", "Bytes read from the board",
+                [f"smarthome_bytes_received_total{_labels(board=board)} {stats.bytes_received}"])
+            add("smarthome_port_errors_total", "counter", "Serial/OS errors on the port",
+                [f"smarthome_port_errors_total{_labels(board=board)} {stats.errors}"])
+            add("smarthome_windows_discarded_total", "counter", "GET windows dropped as short, garbled or trailed by stray bytes",
+                [f"smarthome_windows_discarded_total{_labels(board=board)} {stats.discarded}"])
+            for op, s in sorted(stats.opcodes.items()):
+                opcode = f"0x{op:02X}"
+                add("smarthome_opcode_requests_total", "counter", "GET requests per opcode",
+                    [f"smarthome_opcode_requests_total{_labels(board=board, opcode=opcode)} {s.requests}"])
+                add("smarthome_opcode_timeouts_total", "counter", "GET requests that got no reply",
+                    [f"smarthome_opcode_timeouts_total{_labels(board=board, opcode=opcode)} {s.timeouts}"])
+                add("smarthome_opcode_bad_replies_total", "counter", "GET replies out of range",
+                    [f"smarthome_opcode_bad_replies_total{_labels(board=board, opcode=opcode)} {s.bad}"])
+                add("smarthome_opcode_rtt_seconds", "histogram", "Time until the window holding the opcode was answered",
+                    _histogram_lines("smarthome_opcode_rtt_seconds", s.rtt, board=board, opcode=opcode))
+            add("smarthome_poll_duration_seconds", "histogram", "Duration of one update() poll cycle",
+                _histogram_lines("smarthome_poll_duration_seconds", stats.poll, board=board))
+
+    text = []
+    for name, (kind, help_text, lines) in out.items():
+        text.append(f"# HELP {name} {help_text}")
+        text.append(f"# TYPE {name} {kind}")
+        text.extend(lines)
+    return "\n".join(text) + "\n"
@@ -0,0 +1,289 @@
+"""
+Automation rules over live sensor values.
+
+Rules name the (board, field) inputs they depend on; the engine indexes them
+by those inputs and, on every change listener call, re-evaluates only the
+rules whose inputs changed. Actions are setpoints sent through the board's
+normal setter, after hysteresis / deadband and a per-rule rate limit.
+Actions held back by the rate limit wait in one heap served by a single
+timer thread, however many rules are waiting.
+
+    engine = RulesEngine()
+    engine.attach(manager)                      # or add_board(name, connection)
+    engine.add_rule(ThresholdRule("sun-block", ("living-curtain", "lightIntensity"),
+                                  above=200, below=150,
+                                  high=("living-curtain", 100.0), low=("living-curtain", 0.0),
+                                  min_interval=60))
+    engine.add_rule(LinearRule("ac-follows-outdoor", ("living-curtain", "outdoorTemperature"),
+                               target="living-ac", gain=0.3, offset=17.0, low=20.0, high=26.0))
+
+BoardManager configs take the same rules as JSON under "rules" (see load_rules).
+"""
+import time
+import json
+import heapq
+import threading
+from collections import defaultdict
+
+# Setter per board type; both return False (bad value) or a Future
+SETTERS = {
+    "ac": lambda conn, value: conn.setDesiredTemp(value),
+    "curtain": lambda conn, value: conn.setCurtainStatus(value),
+}
+
+
+class Rule:
+    """ inputs: [(board, field)]; evaluate() returns [(board, setpoint)] to send """
+    def __init__(self, name, inputs, min_interval=0.0):
+        self.name = name
+        self.inputs = list(inputs)
+        self.min_interval = min_interval
+        self.last_action = None     # monotonic time of the last action sent
+        self.pending = None         # actions held back by the rate limit
+
+    def evaluate(self, values):
+        raise NotImplementedError
+
+
+class ThresholdRule(Rule):
+    """
+    Two-state switch with hysteresis: goes high at value >= above, back low
+    at value <= below, and sends the matching action only on a state change.
+    """
+    def __init__(self, name, source, above, below, high=None, low=None, min_interval=0.0):
+        if below > above:
+            raise ValueError(f"{name}: below ({below}) must not exceed above ({above})")
+        super().__init__(name, [source], min_interval)
+        self.source = source
+        self.above = above
+        self.below = below
+        self.high = high            # (board, setpoint) or None
+        self.low = low
+        self.state = None           # None until the value first leaves the band
+
+    def evaluate(self, values):
+        value = values.get(self.source)
+        if value is None:
+            return []
+        if value >= self.above and self.state != "high":
+            self.state = "high"
+            return [self.high] if self.high else []
+        if value <= self.below and self.state != "low":
+            self.state = "low"
+            return [self.low] if self.low else []
+        return []
+
+
+class FunctionRule(Rule):
+    """
+    setpoint = fn({(board, field): value}) for one target board; None = no
+    opinion. A new setpoint is only sent when it moved at least `deadband`
+    from the last one sent.
+    """
+    def __init__(self, name, inputs, target, fn, deadband=0.0, min_interval=0.0):
+        super().__init__(name, inputs, min_interval)
+        self.target = target
+        self.fn = fn
+        self.deadband = deadband
+        self.sent = None
+
+    def evaluate(self, values):
+        if any(key not in values for key in self.inputs):
+            return []
+        setpoint = self.fn(values)
+        if setpoint is None:
+            return []
+        if self.sent is not None and abs(setpoint - self.sent) < self.deadband:
+            return []
+        self.sent = setpoint
+        return [(self.target, setpoint)]
+
+
+class LinearRule(FunctionRule):
+    """ setpoint = offset + gain * input, clamped to [low, high], rounded to 0.1 """
+    def __init__(self, name, source, target, gain, offset, low=None, high=None, deadband=0.5, min_interval=0.0):
+        def fn(values):
+            setpoint = offset + gain * values[source]
+            if low is not None:
+                setpoint = max(low, setpoint)
+            if high is not None:
+                setpoint = min(high, setpoint)
+            return round(setpoint, 1)
+        super().__init__(name, [source], target, fn, deadband, min_interval)
+
+
+class RulesEngine:
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.cond = threading.Condition(self.lock)
+        self.rules = {}
+        self.index = defaultdict(list)    # (board, field) -> [rule]
+        self.values = {}                  # (board, field) -> latest value
+        self.boards = {}                  # name -> (connection, kind)
+        self.held = {}                    # rule name -> monotonic time its held-back actions go out
+        self.heap = []                    # (due, rule name), stale items skipped on pop
+        self.thread = None                # timer thread, started with the first held-back action
+        self.running = False
+        self.evaluations = 0
+        self.actions = 0
+
+    # --- wiring ---
+    def add_board(self, name, connection, kind):
+        self.boards[name] = (connection, kind)
+        with self.lock:
+            # Values already published before we attached
+            for field, value in connection.published.items():
+                self.values[(name, field)] = value
+        connection.addChangeListener(lambda conn, changed: self.on_change(name, changed))
+
+    def attach(self, manager):
+        for name, board in manager.boards.items():
+            self.add_board(name, board.connection, board.kind)
+
+    def add_rule(self, rule):
+        with self.lock:
+            if rule.name in self.rules:
+                self.remove_rule(rule.name)
+            self.rules[rule.name] = rule
+            for key in rule.inputs:
+                self.index[key].append(rule)
+            self._evaluate(rule, time.monotonic())
+
+    def remove_rule(self, name):
+        with self.lock:
+            rule = self.rules.pop(name, None)
+            if rule is None:
+                return
+            for key in rule.inputs:
+                self.index[key].remove(rule)
+                if not self.index[key]:
+                    del self.index[key]
+            # Its heap item goes stale and is dropped when it comes up
+            self.held.pop(name, None)
+
+    # --- evaluation ---
+    def on_change(self, board, changed):
+        """ Change listener: re-evaluates only the rules reading a changed field """
+        now = time.monotonic()
+        with self.lock:
+            affected = {}
+            for field, value in changed.items():
+                key = (board, field)
+                self.values[key] = value
+                for rule in self.index.get(key, ()):
+                    affected[rule.name] = rule
+            for rule in affected.values():
+                self._evaluate(rule, now)
+
+    def _evaluate(self, rule, now):
+        self.evaluations += 1
+        actions = rule.evaluate(self.values)
+        if not actions:
+            return
+        if rule.last_action is not None and now - rule.last_action < rule.min_interval:
+            # Rate limited: keep only the newest decision and send it when allowed
+            rule.pending = actions
+            if rule.name not in self.held:
+                due = rule.last_action + rule.min_interval
+                self.held[rule.name] = due
+                heapq.heappush(self.heap, (due, rule.name))
+                self._start()
+                self.cond.notify()
+            return
+        rule.pending = None
+        rule.last_action = now
+        for board, setpoint in actions:
+            self._send(rule, board, setpoint)
+
+    def _start(self):
+        if self.thread is None:
+            self.running = True
+            self.thread = threading.Thread(target=self._run, name="rules-timer", daemon=True)
+            self.thread.start()
+
+    def _run(self):
+        with self.cond:
+            while self.running:
+                heap = self.heap
+                # Drop items of rules removed or released since they were pushed
+                while heap and self.held.get(heap[0][1]) != heap[0][0]:
+                    heapq.heappop(heap)
+                if not heap:
+                    self.cond.wait()
+                    continue
+                delay = heap[0][0] - time.monotonic()
+                if delay > 0:
+                    self.cond.wait(delay)
+                    continue
+                due, name = heapq.heappop(heap)
+                del self.held[name]
+                self._release(name)
+
+    def _release(self, name):
+        rule = self.rules.get(name)
+        if rule is None or rule.pending is None:
+            return
+        actions, rule.pending = rule.pending, None
+        rule.last_action = time.monotonic()
+        for board, setpoint in actions:
+            self._send(rule, board, setpoint)
+
+    def _send(self, rule, board, setpoint):
+        target = self.boards.get(board)
+        if target is None:
+            print(f"Rule Error ({rule.name}): unknown board {board}")
+            return
+        connection, kind = target
+        if SETTERS[kind](connection, setpoint) is False:
+            print(f"Rule Error ({rule.name}): {setpoint} rejected by {board}")
+            return
+        self.actions += 1
+
+    def stop(self):
+        with self.cond:
+            self.running = False
+            self.held.clear()
+            self.heap.clear()
+            self.cond.notify()
+            thread, self.thread = self.thread, None
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(2.0)
+
+
+def _key(text):
+    """ "board.field" -> (board, field) """
+    board, _, field = text.rpartition(".")
+    return board, field
+
+
+def _action(entry):
+    return None if entry is None else (entry["board"], float(entry["value"]))
+
+
+def load_rules(source):
+    """
+    Rules from a JSON file path or an already parsed list:
+
+      {"name": "sun-block", "type": "threshold", "input": "living-curtain.lightIntensity",
+       "above": 200, "below": 150, "min_interval": 60,
+       "high": {"board": "living-curtain", "value": 100}, "low": {"board": "living-curtain", "value": 0}}
+      {"name": "ac-follows-outdoor", "type": "linear", "input": "living-curtain.outdoorTemperature",
+       "target": "living-ac", "gain": 0.3, "offset": 17, "low": 20, "high": 26, "deadband": 0.5}
+    """
+    if isinstance(source, str):
+        with open(source) as f:
+            source = json.load(f)
+    rules = []
+    for entry in source:
+        kind = entry.get("type", "threshold")
+        if kind == "threshold":
+            rules.append(ThresholdRule(entry["name"], _key(entry["input"]), entry["above"], entry["below"],
+                                       _action(entry.get("high")), _action(entry.get("low")),
+                                       entry.get("min_interval", 0.0)))
+        elif kind == "linear":
+            rules.append(LinearRule(entry["name"], _key(entry["input"]), entry["target"],
+                                    entry["gain"], entry["offset"], entry.get("low"), entry.get("high"),
+                                    entry.get("deadband", 0.5), entry.get("min_interval", 0.0)))
+        else:
+            raise ValueError(f"unknown rule type {kind!r} in {entry.get('name')}")
+    return rules
@@ -0,0 +1,237 @@
+"""
+Streaming filters between a connection and its consumers.
+
+A FilterStage listens to one connection's samples, runs each configured
+field through its own chain of operators and hands the result to its own
+sample / change listeners. Everything else (setters, update(), health ...)
+is passed through to the connection, so the stage can stand in for it in
+BoardManager, the rules engine, the daemon or the GUI. Operators keep only
+their window, never the history:
+
+    EMA(alpha=0.3) / EMA(tau=5.0)    exponential moving average (tau in seconds)
+    RollingMedian(5)                 median of the last n samples
+    RollingMin(60) / RollingMax(60)  extreme over the last n seconds
+    Deadband(0.5, relative=0.02)     only passes a value that moved enough
+
+    stage = FilterStage(connection, {
+        "lightIntensity":     [RollingMedian(5), EMA(tau=3.0), Deadband(2.0)],
+        "outdoorTemperature": [EMA(tau=10.0), Deadband(0.2)],
+    })
+    stage.addChangeListener(on_change)    # far fewer, smoothed changes
+
+BoardManager configs take the same chains per board under "filters" (see
+build_filters). Outputs are rounded to `resolution` (0.1, like the
+registers), so a slowly settling EMA doesn't report every last digit.
+"""
+import math
+import bisect
+import threading
+from collections import deque
+
+
+class EMA:
+    """ Fixed alpha per sample, or alpha from the time since the last sample with tau """
+    def __init__(self, alpha=None, tau=None):
+        if (alpha is None) == (tau is None):
+            raise ValueError("EMA needs exactly one of alpha or tau")
+        self.alpha = alpha
+        self.tau = tau
+        self.value = None
+        self.last = None
+
+    def __call__(self, t, x):
+        if self.value is None:
+            self.value = x
+        else:
+            alpha = self.alpha if self.tau is None else 1.0 - math.exp(-max(0.0, t - self.last) / self.tau)
+            self.value += alpha * (x - self.value)
+        self.last = t
+        return self.value
+
+
+class RollingMedian:
+    """ Median of the last `size` samples (sorted window: bisect + a short memmove) """
+    def __init__(self, size=5):
+        self.size = size
+        self.window = deque()
+        self.sorted = []
+
+    def __call__(self, t, x):
+        self.window.append(x)
+        bisect.insort(self.sorted, x)
+        if len(self.window) > self.size:
+            del self.sorted[bisect.bisect_left(self.sorted, self.window.popleft())]
+        n = len(self.sorted)
+        middle = n // 2
+        return self.sorted[middle] if n % 2 else (self.sorted[middle - 1] + self.sorted[middle]) / 2.0
+
+
+class RollingMin:
+    """ Minimum over the last `window` seconds, amortized O(1) (monotonic deque) """
+    def __init__(self, window=60.0):
+        self.window = window
+        self.samples = deque()    # (t, x), x increasing from the front
+
+    def _keep(self, newer, older):
+        return older < newer
+
+    def __call__(self, t, x):
+        samples = self.samples
+        while samples and not self._keep(x, samples[-1][1]):
+            samples.pop()
+        samples.append((t, x))
+        while samples[0][0] < t - self.window:
+            samples.popleft()
+        return samples[0][1]
+
+
+class RollingMax(RollingMin):
+    """ Maximum over the last `window` seconds """
+    def _keep(self, newer, older):
+        return older > newer
+
+
+class Deadband:
+    """
+    Passes a value only once it is at least `threshold` (or `relative` times
+    the last passed value) away from the last one passed; otherwise the field
+    is dropped from this sample.
+    """
+    def __init__(self, threshold=0.0, relative=0.0):
+        self.threshold = threshold
+        self.relative = relative
+        self.passed = None
+
+    def __call__(self, t, x):
+        if self.passed is not None:
+            band = max(self.threshold, abs(self.passed) * self.relative)
+            if abs(x - self.passed) < band:
+                return None
+        self.passed = x
+        return x
+
+
+class FilterStage:
+    def __init__(self, connection, filters, resolution=0.1):
+        self.connection = connection
+        self.filters = {field: list(chain) for field, chain in filters.items()}
+        self.resolution = resolution
+        self.lock = threading.Lock()
+        self.values = {}          # field -> latest filtered value
+        self.listeners = []
+        self.changeListeners = []
+        self.published = {}
+        connection.addSampleListener(self._on_sample)
+
+    def __getattr__(self, name):
+        # Only called for what the stage doesn't have itself: filtered fields
+        # read from self.values, everything else from the connection
+        values = self.__dict__.get("values")
+        if values is not None and name in values:
+            return values[name]
+        connection = self.__dict__["connection"]
+        if name.startswith("get"):
+            # getLightIntensity() etc. bound to the stage, so they read through _get below
+            method = getattr(type(connection), name, None)
+            if callable(method):
+                return method.__get__(self)
+        return getattr(connection, name)
+
+    def _get(self, field, with_age):
+        with self.lock:
+            value = self.values[field] if field in self.values else getattr(self.connection, field)
+        return (value, self.connection.cache.age(field)) if with_age else value
+
+    def _filter(self, field, t, x):
+        for op in self.filters[field]:
+            x = op(t, x)
+            if x is None:
+                return None
+        if self.resolution:
+            x = round(round(x / self.resolution) * self.resolution, 6)
+        return x
+
+    def _on_sample(self, connection, stamp, values):
+        out = {}
+        with self.lock:
+            for field, value in values.items():
+                if field not in self.filters:
+                    out[field] = value
+                    continue
+                filtered = self._filter(field, stamp, value)
+                if filtered is not None:
+                    self.values[field] = out[field] = filtered
+                elif field not in self.values:
+                    # Nothing passed yet: show the raw value rather than none at all
+                    self.values[field] = value
+        if not out:
+            return
+        for callback in list(self.listeners):
+            try:
+                callback(self, stamp, out)
+            except Exception as e:
+                print(f"Listener Error ({self.connection.comPort}): {e}")
+        changed = {f: v for f, v in out.items() if self.published.get(f) != v}
+        if not changed:
+            return
+        self.published.update(changed)
+        for callback in list(self.changeListeners):
+            try:
+                callback(self, changed)
+            except Exception as e:
+                print(f"Listener Error ({self.connection.comPort}): {e}")
+
+    def addSampleListener(self, callback):
+        """ callback(stage, wall_time, {field: filtered value}) """
+        self.listeners.append(callback)
+
+    def removeSampleListener(self, callback):
+        if callback in self.listeners:
+            self.listeners.remove(callback)
+
+    def addChangeListener(self, callback):
+        """ callback(stage, {field: filtered value}) with only the fields whose filtered value changed """
+        self.changeListeners.append(callback)
+
+    def removeChangeListener(self, callback):
+        if callback in self.changeListeners:
+            self.changeListeners.remove(callback)
+
+    def snapshot(self):
+        values = self.connection.snapshot()
+        with self.lock:
+            values.update((f, v) for f, v in self.values.items() if f in values)
+        return values
+
+    def raw(self, field):
+        """ Unfiltered latest value """
+        return getattr(self.connection, field)
+
+
+OPERATORS = {
+    "ema": EMA,
+    "median": RollingMedian,
+    "min": RollingMin,
+    "max": RollingMax,
+    "deadband": Deadband,
+}
+
+
+def build_filters(config):
+    """
+    {field: [step, ...]} from JSON, a step being {"type": name, **arguments}:
+
+      {"lightIntensity": [{"type": "median", "size": 5}, {"type": "ema", "tau": 3},
+                          {"type": "deadband", "threshold": 2}]}
+    """
+    filters = {}
+    for field, steps in config.items():
+        chain = []
+        for step in steps:
+            step = dict(step)
+            kind = step.pop("type")
+            if kind not in OPERATORS:
+                raise ValueError(f"unknown filter type {kind!r} for {field}")
+            chain.append(OPERATORS[kind](**step))
+        filters[field] = chain
+    return filters
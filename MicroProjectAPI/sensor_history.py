@@ -0,0 +1,208 @@
+"""
+Fixed-capacity, change-only time series for one board's readings.
+
+Register values change rarely (0.1 steps, a setpoint that sits for hours),
+so a field only gets a row when its value changes, plus a keyframe every
+`keyframe` seconds while it holds still so gaps in the data stay visible.
+Rows are delta encoded in preallocated NumPy rings, one per field, and
+nothing is allocated per sample:
+  - dt : uint16 milliseconds since the field's previous row
+  - dv : int16 change in tenths (raw counts for WORD_REGISTERS such as pressure)
+So a row costs 4 bytes, and only changes cost rows: a field whose value
+changes on one 10 Hz sample in ten fills 1 MB in three days; a setpoint
+costs ~6 KB a day in keyframes. The ring keeps the absolute value of its
+oldest row, everything else is rebuilt with a cumulative sum on query.
+
+The series is a step function: queries carry the value in force at t0 into
+the window, and means are time weighted.
+
+    history = attach_history(connection, capacity=262144)    # rows per field
+    t, v = history.range("ambientTemperature", time.time() - 3600)
+"""
+import time
+import threading
+import numpy as np
+
+DT_MAX = np.iinfo(np.uint16).max
+DV_MAX = np.iinfo(np.int16).max
+
+
+class _FieldRing:
+    """ Delta-encoded rows of one field; base_* is the absolute oldest row """
+    def __init__(self, capacity):
+        self.capacity = max(2, capacity)
+        self.dt = np.zeros(self.capacity, dtype=np.uint16)
+        self.dv = np.zeros(self.capacity, dtype=np.int16)
+        self.head = 0        # next slot to write
+        self.count = 0
+        self.base_t = self.base_v = None
+        self.last_t = self.last_v = None
+        self.seen = None     # ms of the last sample, changed or not
+
+    def _push(self, dt, dv):
+        if self.count == self.capacity:
+            # The oldest row (at head) goes; the next one becomes the absolute base
+            nxt = (self.head + 1) % self.capacity
+            self.base_t += int(self.dt[nxt])
+            self.base_v += int(self.dv[nxt])
+        else:
+            self.count += 1
+        self.dt[self.head] = dt
+        self.dv[self.head] = dv
+        self.head = (self.head + 1) % self.capacity
+
+    def add(self, t, v, keyframe):
+        self.seen = t if self.seen is None else max(self.seen, t)
+        if self.last_t is None:
+            self.base_t, self.base_v = t, v
+            self._push(0, 0)
+        elif t < self.last_t or (v == self.last_v and t - self.last_t < keyframe):
+            return
+        else:
+            # Steps beyond the 16-bit deltas become extra rows: time first, then value
+            dt, dv = t - self.last_t, v - self.last_v
+            while dt > DT_MAX:
+                self._push(DT_MAX, 0)
+                dt -= DT_MAX
+            while abs(dv) > DV_MAX:
+                step = DV_MAX if dv > 0 else -DV_MAX
+                self._push(dt, step)
+                dt, dv = 0, dv - step
+            self._push(dt, dv)
+        self.last_t, self.last_v = t, v
+
+    def decode(self):
+        """ (t ms, v) int64 arrays of every row, chronological """
+        if not self.count:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        if self.count < self.capacity:
+            dt, dv = self.dt[:self.count], self.dv[:self.count]
+        else:
+            dt = np.concatenate((self.dt[self.head:], self.dt[:self.head]))
+            dv = np.concatenate((self.dv[self.head:], self.dv[:self.head]))
+        dt = dt.astype(np.int64)
+        dv = dv.astype(np.int64)
+        dt[0] = dv[0] = 0
+        return self.base_t + np.cumsum(dt), self.base_v + np.cumsum(dv)
+
+
+class SensorHistory:
+    def __init__(self, fields, capacity=262144, epoch=None, raw_fields=(), keyframe=60.0):
+        self.fields = list(fields)
+        # Tenths for decimal registers, 1 for raw words
+        self.scales = {field: 1.0 if field in raw_fields else 10.0 for field in self.fields}
+        self.capacity = capacity
+        self.epoch = time.time() if epoch is None else epoch
+        self.keyframe = int(keyframe * 1000)
+        self.rings = {field: _FieldRing(capacity) for field in self.fields}
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return sum(ring.count for ring in self.rings.values())
+
+    def nbytes(self):
+        return sum(ring.dt.nbytes + ring.dv.nbytes for ring in self.rings.values())
+
+    def append(self, timestamp, values):
+        """ values: {field: float}; fields not given are left as they are """
+        t = int((timestamp - self.epoch) * 1000)
+        with self.lock:
+            for field, value in values.items():
+                ring = self.rings.get(field)
+                if ring is not None:
+                    ring.add(t, int(round(value * self.scales[field])), self.keyframe)
+
+    def on_sample(self, connection, timestamp, values):
+        """ Sample listener signature, see HomeAutomationSystemConnection.addSampleListener """
+        self.append(timestamp, values)
+
+    def _series(self, field):
+        """ (row times, row values, end of coverage), wall clock seconds and field units """
+        ring = self.rings[field]
+        with self.lock:
+            t, v = ring.decode()
+            seen = ring.seen
+        end = None if seen is None else seen / 1000.0 + self.epoch
+        return t / 1000.0 + self.epoch, v / self.scales[field], end
+
+    def range(self, field, t0=None, t1=None):
+        """
+        (times, values) of the changes in t0 <= t < t1, starting with the value
+        in force at t0 (stamped t0) when it was set earlier
+        """
+        t, v, end = self._series(field)
+        a = 0 if t0 is None else np.searchsorted(t, t0, side="right")
+        b = len(t) if t1 is None else np.searchsorted(t, t1, side="left")
+        if t0 is not None and a > 0 and (end is None or t0 < end) and (t1 is None or t0 < t1):
+            # Carry the value in force at t0 into the window
+            return np.concatenate(([t0], t[a:b])), np.concatenate(([v[a - 1]], v[a:b]))
+        return t[a:b], v[a:b]
+
+    def stats(self, field, t0=None, t1=None):
+        """ {count (rows), min, max, mean (time weighted)}, None values when empty """
+        t, v, end = self._series(field)
+        if not len(t) or (t1 is not None and t1 <= t[0]) or (t0 is not None and t0 >= end):
+            return {"count": 0, "min": None, "max": None, "mean": None}
+        t0 = t[0] if t0 is None else t0
+        t1 = end if t1 is None else t1
+        starts, mins, maxs, means = self.downsample(field, t0, max(t1, t0 + 1e-3), 1)
+        rows = np.searchsorted(t, t1, side="left") - np.searchsorted(t, t0, side="left")
+        mean = means[0] if not np.isnan(means[0]) else mins[0]
+        return {"count": int(rows), "min": float(mins[0]), "max": float(maxs[0]), "mean": float(mean)}
+
+    def downsample(self, field, t0, t1, buckets):
+        """
+        Splits [t0, t1) into equal buckets and returns (bucket start times, min,
+        max, mean); buckets without data are NaN. Min/max include the value
+        carried into the bucket, so spikes and plateaus both show in charts.
+        """
+        t, v, end = self._series(field)
+        edges = np.linspace(t0, t1, buckets + 1)
+        mins = np.full(buckets, np.nan)
+        maxs = np.full(buckets, np.nan)
+        means = np.full(buckets, np.nan)
+        if not len(t):
+            return edges[:-1], mins, maxs, means
+        lo, hi = edges[:-1], edges[1:]
+        covered = (hi > t[0]) & (lo < end)
+
+        # Rows after each bucket's start: reduceat over (start, stop) pairs, the
+        # odd slices in between are discarded (v gets a pad so stop may be len(v))
+        inside_start = np.searchsorted(t, lo, side="right")
+        inside_stop = np.searchsorted(t, hi, side="left")
+        filled = inside_stop > inside_start
+        if filled.any():
+            idx = np.stack((inside_start[filled], inside_stop[filled]), axis=1).ravel()
+            padded = np.append(v, 0.0)
+            mins[filled] = np.minimum.reduceat(padded, idx)[::2]
+            maxs[filled] = np.maximum.reduceat(padded, idx)[::2]
+
+        # Value in force at each bucket start
+        carried = inside_start - 1
+        carried_v = np.where(carried >= 0, v[np.maximum(carried, 0)], np.nan)
+        mins = np.fmin(mins, carried_v)
+        maxs = np.fmax(maxs, carried_v)
+
+        # Time-weighted mean from the integral of the step function
+        area = np.concatenate(([0.0], np.cumsum(v[:-1] * np.diff(t))))
+
+        def integral(x):
+            k = np.maximum(np.searchsorted(t, x, side="right") - 1, 0)
+            return area[k] + v[k] * (x - t[k])
+        a = np.maximum(lo, t[0])
+        b = np.minimum(hi, end)
+        span = b - a
+        positive = covered & (span > 0)
+        means[positive] = (integral(b[positive]) - integral(a[positive])) / span[positive]
+
+        mins[~covered] = maxs[~covered] = means[~covered] = np.nan
+        return lo, mins, maxs, means
+
+
+def attach_history(connection, capacity=262144):
+    """ Creates a SensorHistory for the connection's registers and feeds it from every update """
+    history = SensorHistory([field for field, op_frac, op_int in connection.REGISTER_MAP], capacity,
+                            raw_fields=getattr(connection, "WORD_REGISTERS", ()))
+    connection.addSampleListener(history.on_sample)
+    connection.history = history
+    return history
@@ -0,0 +1,335 @@
+"""
+Serial protocol trace recorder and replay transport.
+
+TracingSerial wraps the real port and logs everything the driver sees:
+bytes written, bytes each read() returned, in_waiting answers and bytes
+thrown away by reset_input_buffer(), plus every reading of the driver's
+poll clock (cache TTLs, reconnect backoff). ReplaySerial plays such a trace
+back into the unmodified connection classes, in real time or as fast as
+possible, and answers the clock readings from the trace, so the replayed
+driver polls exactly what it polled when it was recorded:
+
+    conn = AirConditionerSystemConnection()
+    conn.serialFactory = trace_factory("field.htr")             # record
+    conn.serialFactory = replay_factory("field.htr", realtime=False)  # replay
+
+File: 16-byte header, then 6-byte records (little endian):
+dt uint32 (microseconds since the previous record), kind uint8, value uint8.
+
+    python serial_trace.py dump field.htr
+    python serial_trace.py replay field.htr --board ac [--realtime]
+"""
+import os
+import sys
+import time
+import struct
+import argparse
+import threading
+import serial
+
+MAGIC = b"HATRC001"
+HEADER = struct.Struct("<8sHHf")      # magic, version, record size, reserved
+RECORD = struct.Struct("<IBB")
+VERSION = 2          # 2: CLOCK records
+
+# Record kinds
+TX = 0          # value = byte written
+RX = 1          # value = byte returned by read()
+READ_END = 2    # value = bytes requested; closes one read() call
+WAITING = 3     # value = in_waiting answer (capped at 255)
+DRAIN = 4       # value = bytes dropped by reset_input_buffer (capped at 255)
+OPEN = 5        # port (re)opened
+CLOCK = 6       # driver read its poll clock; the record's time is the reading
+KIND_NAMES = {TX: "TX", RX: "RX", READ_END: "READ_END", WAITING: "WAITING", DRAIN: "DRAIN",
+              OPEN: "OPEN", CLOCK: "CLOCK"}
+
+MAX_DT = 0xFFFFFFFF
+
+
+class TraceWriter:
+    def __init__(self, path):
+        self.file = open(path, "wb")
+        self.file.write(HEADER.pack(MAGIC, VERSION, RECORD.size, 0.0))
+        self.lock = threading.Lock()
+        self.last = time.perf_counter()
+
+    def record(self, kind, values, now=None):
+        """ One record per value, all stamped now """
+        if not values:
+            return
+        now = time.perf_counter() if now is None else now
+        with self.lock:
+            if self.file is None:
+                return
+            dt = min(MAX_DT, int((now - self.last) * 1e6))
+            self.last = now
+            first = True
+            for value in values:
+                self.file.write(RECORD.pack(dt if first else 0, kind, min(255, value)))
+                first = False
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+
+class TracingSerial:
+    """ Serial-like proxy that logs every exchange to a TraceWriter """
+    def __init__(self, ser, writer):
+        self.ser = ser
+        self.writer = writer
+        writer.record(OPEN, (0,))
+
+    def write(self, data):
+        written = self.ser.write(data)
+        self.writer.record(TX, data)
+        return written
+
+    def read(self, size=1):
+        data = self.ser.read(size)
+        self.writer.record(RX, data)
+        self.writer.record(READ_END, (size,))
+        return data
+
+    @property
+    def in_waiting(self):
+        count = self.ser.in_waiting
+        self.writer.record(WAITING, (count,))
+        return count
+
+    def reset_input_buffer(self):
+        # Read what is about to be dropped so the trace shows it
+        dropped = self.ser.read(self.ser.in_waiting) if self.ser.in_waiting else b""
+        self.ser.reset_input_buffer()
+        self.writer.record(DRAIN, (len(dropped),))
+
+    def flushInput(self):
+        self.reset_input_buffer()
+
+    def clock(self):
+        """ The driver's poll clock: the reading is logged so a replay can give it back """
+        now = time.perf_counter()
+        self.writer.record(CLOCK, (0,), now)
+        return now
+
+    def now(self):
+        """ Same time base as clock(), not logged (cache ages, health) """
+        return time.perf_counter()
+
+    @property
+    def timeout(self):
+        return self.ser.timeout
+
+    @timeout.setter
+    def timeout(self, value):
+        self.ser.timeout = value
+
+    def __getattr__(self, name):
+        # flushOutput, is_open, close, ... go straight to the port
+        return getattr(self.ser, name)
+
+
+def trace_factory(path, opener=serial.Serial):
+    """ serialFactory recording to path; reconnects append to the same trace """
+    writer = TraceWriter(path)
+
+    def factory(port, baudrate, **kwargs):
+        return TracingSerial(opener(port, baudrate, **kwargs), writer)
+    factory.writer = writer
+    return factory
+
+
+def load_trace(path):
+    """ [(t seconds from start, kind, value)] """
+    with open(path, "rb") as f:
+        data = f.read()
+    magic, version, record_size, _ = HEADER.unpack_from(data, 0)
+    if magic != MAGIC or record_size != RECORD.size:
+        raise ValueError(f"{path} is not a serial trace")
+    events = []
+    t = 0.0
+    usable = (len(data) - HEADER.size) // RECORD.size * RECORD.size
+    for dt, kind, value in RECORD.iter_unpack(data[HEADER.size:HEADER.size + usable]):
+        t += dt / 1e6
+        events.append((t, kind, value))
+    return events
+
+
+class ReplaySerial:
+    """
+    Answers the driver from a trace. Writes advance the cursor over the
+    recorded TX bytes; reads, in_waiting and reset_input_buffer get exactly
+    what the board gave the first time. The driver's clock runs on trace
+    time: clock() returns the recorded readings, now() the time of the last
+    event played. realtime=True also waits out the recorded reply delays
+    (timeouts included), measured from the driver's own writes. If the
+    driver sends something else than was recorded, the cursor skips ahead
+    to where the trace sent the same bytes and `divergences` counts it.
+    """
+    def __init__(self, events, realtime=False):
+        self.events = events
+        self.realtime = realtime
+        self.pos = 0
+        self.offset = None         # wall clock minus trace time, re-anchored on every write
+        self.divergences = 0
+        self.is_open = True
+        self.timeout = 0.1
+
+    @classmethod
+    def from_file(cls, path, realtime=False):
+        return cls(load_trace(path), realtime)
+
+    @property
+    def exhausted(self):
+        return self.pos >= len(self.events)
+
+    def _peek(self):
+        return self.events[self.pos] if self.pos < len(self.events) else None
+
+    def _wait_until(self, t):
+        if self.realtime and self.offset is not None:
+            delay = t + self.offset - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+    def _skip_marks(self, kinds=(OPEN, CLOCK)):
+        # Clock readings the driver didn't repeat are passed over like reopens
+        while self._peek() is not None and self._peek()[1] in kinds:
+            self.pos += 1
+
+    def clock(self):
+        self._skip_marks((OPEN,))
+        event = self._peek()
+        if event is not None and event[1] == CLOCK:
+            self.pos += 1
+            return event[0]
+        return self.now()
+
+    def now(self):
+        return self.events[self.pos - 1][0] if self.pos else 0.0
+
+    def _matches(self, pos, data):
+        for i, byte_val in enumerate(data):
+            if pos + i >= len(self.events):
+                return False
+            t, kind, value = self.events[pos + i]
+            if kind != TX or value != byte_val:
+                return False
+        return True
+
+    def _find(self, data):
+        """ First position at or after the cursor where the trace wrote data """
+        for pos in range(self.pos, len(self.events)):
+            if self._matches(pos, data):
+                return pos
+        return None
+
+    def write(self, data):
+        self._skip_marks()
+        if not data:
+            return 0
+        pos = self.pos if self._matches(self.pos, data) else self._find(data)
+        if pos is None:
+            self.pos = len(self.events)
+            return len(data)
+        if pos != self.pos:
+            self.divergences += 1
+        self.pos = pos + len(data)
+        self.offset = time.monotonic() - self.events[self.pos - 1][0]
+        return len(data)
+
+    def read(self, size=1):
+        self._skip_marks()
+        data = bytearray()
+        while self._peek() is not None and self._peek()[1] == RX:
+            data.append(self._peek()[2])
+            self.pos += 1
+        event = self._peek()
+        if event is not None and event[1] == READ_END:
+            self._wait_until(event[0])
+            self.pos += 1
+        return bytes(data[:size])
+
+    @property
+    def in_waiting(self):
+        self._skip_marks()
+        event = self._peek()
+        if event is not None and event[1] == WAITING:
+            self.pos += 1
+            return event[2]
+        return 0
+
+    def reset_input_buffer(self):
+        self._skip_marks()
+        event = self._peek()
+        if event is not None and event[1] == DRAIN:
+            self.pos += 1
+
+    def flushInput(self):
+        self.reset_input_buffer()
+
+    def flushOutput(self):
+        pass
+
+    def close(self):
+        # A reconnect reopens the same replay and carries on where it was
+        self.is_open = False
+
+
+def replay_factory(path, realtime=False):
+    replay = ReplaySerial.from_file(path, realtime)
+
+    def factory(port, baudrate, **kwargs):
+        replay.is_open = True
+        replay.timeout = kwargs.get("timeout", replay.timeout)
+        return replay
+    factory.replay = replay
+    return factory
+
+
+def _dump(path):
+    for t, kind, value in load_trace(path):
+        print(f"{t:12.6f}  {KIND_NAMES.get(kind, kind):8s}  0x{value:02X}")
+
+
+def _replay(path, board, realtime):
+    from smart_home_api import AirConditionerSystemConnection, CurtainControlSystemConnection
+    conn = {"ac": AirConditionerSystemConnection, "curtain": CurtainControlSystemConnection}[board]()
+    factory = replay_factory(path, realtime)
+    conn.serialFactory = factory
+    conn.setComPort(os.path.basename(path))
+    started = time.perf_counter()
+    if not conn.open():
+        return 1
+    polls = 0
+    while not factory.replay.exhausted:
+        conn.update()
+        polls += 1
+    elapsed = time.perf_counter() - started
+    conn.close()
+    print(f"{polls} polls in {elapsed:.3f} s ({polls / elapsed:.0f}/s), "
+          f"{factory.replay.divergences} divergences")
+    print(conn.snapshot())
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serial trace tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    dump = sub.add_parser("dump", help="print a trace")
+    dump.add_argument("trace")
+    replay = sub.add_parser("replay", help="run the driver against a trace")
+    replay.add_argument("trace")
+    replay.add_argument("--board", choices=["ac", "curtain"], required=True)
+    replay.add_argument("--realtime", action="store_true", help="keep the recorded reply timing")
+    args = parser.parse_args()
+    if args.command == "dump":
+        _dump(args.trace)
+        return 0
+    return _replay(args.trace, args.board, args.realtime)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,294 @@
+"""
+Weekly setpoint programs for any number of boards.
+
+Each program entry is "on these weekdays at HH:MM (local time), set this
+board to this value". The scheduler keeps one heap item per entry (its next
+occurrence), sleeps until the earliest one is due and sends it through the
+board's normal setter. Adding or removing entries wakes it up; nothing is
+scanned per tick, so tens of thousands of entries cost one heap operation
+each per occurrence.
+
+Restarts need no saved state: start() first sends every board the value of
+its most recent past entry, i.e. what the program says it should be right
+now. The same happens when the wall clock jumps (NTP step, manual change,
+resume from suspend): the heap is rebuilt from the new time and boards are
+brought to their current program value instead of replaying what was
+skipped.
+
+    scheduler = SetpointScheduler()
+    scheduler.attach(manager)                    # or add_board(name, connection, kind)
+    scheduler.add("living-ac", "mon-fri", "22:30", 21.0)
+    scheduler.add("living-curtain", "daily", "07:00", 100.0)
+    scheduler.start()
+
+BoardManager configs take the same entries as JSON under "schedule" (see
+load_schedule).
+"""
+import time
+import json
+import heapq
+import datetime
+import functools
+import itertools
+import threading
+from rules_engine import SETTERS
+
+DAYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+
+
+def parse_days(spec):
+    """ "daily", "weekdays", "weekends", "mon-fri", "sat,sun" or a list of those -> frozenset of 0..6 """
+    if isinstance(spec, (list, tuple, set, frozenset)):
+        return frozenset().union(*(parse_days(part) for part in spec))
+    spec = str(spec).strip().lower()
+    if spec == "daily":
+        return frozenset(range(7))
+    if spec == "weekdays":
+        return frozenset(range(5))
+    if spec == "weekends":
+        return frozenset((5, 6))
+    days = set()
+    for part in spec.split(","):
+        first, _, last = part.strip().partition("-")
+        start = DAYS.index(first[:3])
+        stop = DAYS.index(last[:3]) if last else start
+        days.update(range(start, stop + 1) if start <= stop else [*range(start, 7), *range(0, stop + 1)])
+    return frozenset(days)
+
+
+def parse_time(spec):
+    """ "HH:MM" -> minutes after midnight """
+    hours, _, minutes = str(spec).partition(":")
+    minute = int(hours) * 60 + int(minutes or 0)
+    if not 0 <= minute < 24 * 60:
+        raise ValueError(f"bad time of day {spec!r}")
+    return minute
+
+
+@functools.lru_cache(maxsize=16384)
+def _local_time(date, minute):
+    """ Unix time of minute-of-day on a local date (mktime settles DST); entries share these """
+    moment = datetime.datetime.combine(date, datetime.time(minute // 60, minute % 60))
+    return time.mktime(moment.timetuple()[:8] + (-1,))
+
+
+class ProgramEntry:
+    __slots__ = ("id", "board", "days", "minute", "value", "due")
+
+    def __init__(self, entry_id, board, days, minute, value):
+        self.id = entry_id
+        self.board = board
+        self.days = days
+        self.minute = minute
+        self.value = value
+        self.due = None      # unix time of the occurrence currently in the heap
+
+    def next_after(self, t):
+        """ First occurrence strictly after t """
+        today = datetime.date.fromtimestamp(t)
+        for offset in range(8):
+            date = today + datetime.timedelta(days=offset)
+            if date.weekday() in self.days:
+                at = _local_time(date, self.minute)
+                if at > t:
+                    return at
+        return None
+
+    def last_at_or_before(self, t):
+        """ Latest occurrence at or before t """
+        today = datetime.date.fromtimestamp(t)
+        for offset in range(8):
+            date = today - datetime.timedelta(days=offset)
+            if date.weekday() in self.days:
+                at = _local_time(date, self.minute)
+                if at <= t:
+                    return at
+        return None
+
+
+class SetpointScheduler:
+    """
+    max_sleep bounds one wait, so a wall clock jump is noticed within that
+    time; a jump is a difference of more than jump_threshold seconds between
+    wall clock and monotonic time over one wait.
+    """
+    def __init__(self, max_sleep=60.0, jump_threshold=5.0):
+        self.max_sleep = max_sleep
+        self.jump_threshold = jump_threshold
+        self.cond = threading.Condition()
+        self.entries = {}                 # id -> ProgramEntry
+        self.heap = []                    # (due, id), stale items skipped on pop
+        self.boards = {}                  # name -> (connection, kind)
+        self.ids = itertools.count(1)
+        self.running = False
+        self.thread = None
+        self.fired = 0
+        self.jumps = 0
+
+    # --- wiring ---
+    def add_board(self, name, connection, kind):
+        self.boards[name] = (connection, kind)
+
+    def attach(self, manager):
+        for name, board in manager.boards.items():
+            self.add_board(name, board.connection, board.kind)
+
+    # --- program ---
+    def add(self, board, days, at, value):
+        """ Returns the entry id (for remove) """
+        entry = ProgramEntry(next(self.ids), board, parse_days(days), parse_time(at), float(value))
+        if not entry.days:
+            raise ValueError(f"no weekdays in {days!r}")
+        with self.cond:
+            self.entries[entry.id] = entry
+            self._push(entry, time.time())
+            self.cond.notify()
+        return entry.id
+
+    def remove(self, entry_id):
+        with self.cond:
+            # Its heap item goes stale and is dropped when it comes up
+            return self.entries.pop(entry_id, None) is not None
+
+    def clear(self, board=None):
+        with self.cond:
+            for entry_id in [i for i, e in self.entries.items() if board is None or e.board == board]:
+                del self.entries[entry_id]
+
+    def program(self, board):
+        """ [(days, "HH:MM", value, id)] of one board, in time order """
+        with self.cond:
+            entries = sorted((e for e in self.entries.values() if e.board == board), key=lambda e: e.minute)
+            return [([DAYS[d] for d in sorted(e.days)], f"{e.minute // 60:02d}:{e.minute % 60:02d}", e.value, e.id)
+                    for e in entries]
+
+    def next_due(self):
+        """ (unix time, board, value) of the next event, None if there is none """
+        with self.cond:
+            self._drop_stale()
+            if not self.heap:
+                return None
+            entry = self.entries[self.heap[0][1]]
+            return entry.due, entry.board, entry.value
+
+    def current(self, board, now=None):
+        """ What the program says the board should be at now (None if it has no entries) """
+        now = time.time() if now is None else now
+        with self.cond:
+            best = max(((e.last_at_or_before(now), e.id, e) for e in self.entries.values() if e.board == board),
+                       default=None, key=lambda item: item[:2])
+            return None if best is None else best[2].value
+
+    # --- heap ---
+    def _push(self, entry, now):
+        entry.due = entry.next_after(now)
+        heapq.heappush(self.heap, (entry.due, entry.id))
+
+    def _drop_stale(self):
+        heap = self.heap
+        while heap:
+            due, entry_id = heap[0]
+            entry = self.entries.get(entry_id)
+            if entry is not None and entry.due == due:
+                return
+            heapq.heappop(heap)
+
+    def _rebuild(self, now):
+        for entry in self.entries.values():
+            entry.due = entry.next_after(now)
+        self.heap = [(entry.due, entry.id) for entry in self.entries.values()]
+        heapq.heapify(self.heap)
+
+    def _pop_due(self, now):
+        """ {board: value} of every entry due by now (the latest per board wins) """
+        due = {}
+        while True:
+            self._drop_stale()
+            if not self.heap or self.heap[0][0] > now:
+                return due
+            at, entry_id = heapq.heappop(self.heap)
+            entry = self.entries[entry_id]
+            previous = due.get(entry.board)
+            if previous is None or previous[0] <= at:
+                due[entry.board] = (at, entry.value)
+            self._push(entry, max(now, at))
+
+    def _current_all(self, now):
+        """ {board: value} from each board's most recent past entry """
+        latest = {}
+        for entry in self.entries.values():
+            at = entry.last_at_or_before(now)
+            previous = latest.get(entry.board)
+            if previous is None or (at, entry.id) > previous[:2]:
+                latest[entry.board] = (at, entry.id, entry.value)
+        return {board: item[2] for board, item in latest.items()}
+
+    # --- running ---
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="setpoint-scheduler", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        with self.cond:
+            self.running = False
+            self.cond.notify()
+        if self.thread is not None:
+            self.thread.join(2.0)
+            self.thread = None
+
+    def _run(self):
+        with self.cond:
+            now = time.time()
+            self._rebuild(now)
+            # Restart: bring every board to what its program says right now
+            sends = self._current_all(now)
+        while True:
+            for board, value in sends.items():
+                self._send(board, value)
+            with self.cond:
+                if not self.running:
+                    return
+                self._drop_stale()
+                now = time.time()
+                timeout = self.max_sleep if not self.heap else min(self.max_sleep, max(0.0, self.heap[0][0] - now))
+                wall, mono = now, time.monotonic()
+                self.cond.wait(timeout)
+                if not self.running:
+                    return
+                now = time.time()
+                if abs((now - wall) - (time.monotonic() - mono)) > self.jump_threshold:
+                    # Wall clock jumped: skipped or repeated events are not replayed
+                    self.jumps += 1
+                    self._rebuild(now)
+                    sends = self._current_all(now)
+                else:
+                    sends = {board: value for board, (at, value) in self._pop_due(now).items()}
+                self.fired += len(sends)
+
+    def _send(self, board, value):
+        target = self.boards.get(board)
+        if target is None:
+            print(f"Schedule Error: unknown board {board}")
+            return
+        connection, kind = target
+        try:
+            if SETTERS[kind](connection, value) is False:
+                print(f"Schedule Error: {value} rejected by {board}")
+        except Exception as e:
+            print(f"Schedule Error ({board}): {e}")
+
+
+def load_schedule(source):
+    """
+    [(board, days, "HH:MM", value)] from a JSON file path or an already parsed list:
+
+      {"board": "living-ac", "days": "mon-fri", "time": "22:30", "value": 21}
+      {"board": "living-curtain", "days": ["sat", "sun"], "time": "09:00", "value": 100}
+    """
+    if isinstance(source, str):
+        with open(source) as f:
+            source = json.load(f)
+    return [(entry["board"], entry.get("days", "daily"), entry["time"], entry["value"]) for entry in source]
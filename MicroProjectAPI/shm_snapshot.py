@@ -0,0 +1,224 @@
+"""
+Latest board values in shared memory, for readers in other processes.
+
+The polling process publishes every board's newest values into one
+multiprocessing.shared_memory block; loggers, optimizers etc. attach to it by
+name and read consistent snapshots without touching the serial port. A read
+is a few struct unpacks straight from the mapped buffer: no syscalls, no
+serial traffic.
+
+Layout (little endian):
+
+    header  16 bytes   magic 8s, version uint16, slot size uint16,
+                       capacity uint16, boards uint16
+    slot    104 bytes  seq uint32, kind uint8, state uint8, 2 pad,
+                       name 32s (utf-8, NUL padded), stamp float64 (unix time),
+                       7 x float64 values in FIELDS order (NaN = not on this board)
+
+Each slot is a seqlock: the writer makes `seq` odd, writes the slot, then
+makes it even again. A reader that saw the same even `seq` before and after
+copying the slot got a consistent snapshot, otherwise it retries.
+
+    publisher = SnapshotPublisher("smarthome")
+    attach_snapshot(connection, publisher, "living-ac")
+    ...
+    reader = SnapshotReader("smarthome")          # any process
+    reader.read("living-ac")   # {"stamp": ..., "state": ..., "ambientTemperature": ...}
+
+    python shm_snapshot.py smarthome [--watch 1]
+"""
+import math
+import time
+import struct
+import argparse
+import threading
+from multiprocessing import shared_memory
+
+MAGIC = b"HASHM001"
+VERSION = 1
+HEADER = struct.Struct("<8sHHHH")
+SEQ = struct.Struct("<I")
+FIELDS = ("desiredTemperature", "ambientTemperature", "fanSpeed", "curtainStatus",
+          "outdoorTemperature", "outdoorPressure", "lightIntensity")
+BODY = struct.Struct("<BB2x32sd%dd" % len(FIELDS))    # everything after seq
+SLOT_SIZE = SEQ.size + BODY.size
+KINDS = (None, "ac", "curtain")
+STATES = (None, "connected", "degraded", "reconnecting", "disconnected", "simulation")
+FIELD_INDEX = {field: i for i, field in enumerate(FIELDS)}
+
+
+def _slot_offset(slot):
+    return HEADER.size + slot * SLOT_SIZE
+
+
+class SnapshotPublisher:
+    """
+    Owns the block. Boards get a slot on first publish, up to `capacity`.
+    A block left behind by a crashed owner with the same name is taken over.
+    """
+    def __init__(self, name="smarthome", capacity=256):
+        size = HEADER.size + capacity * SLOT_SIZE
+        try:
+            self.shm = shared_memory.SharedMemory(name, create=True, size=size)
+        except FileExistsError:
+            self.shm = shared_memory.SharedMemory(name)
+            if self.shm.size < size:
+                self.shm.close()
+                raise ValueError(f"shared memory {name!r} exists and is smaller than {size} bytes")
+        self.name = name
+        self.capacity = capacity
+        self.buf = self.shm.buf
+        self.lock = threading.Lock()
+        self.slots = {}     # board -> (slot, seq, kind code, [values])
+        self.buf[:size] = bytes(size)
+        HEADER.pack_into(self.buf, 0, MAGIC, VERSION, SLOT_SIZE, capacity, 0)
+
+    def _slot(self, board, kind):
+        entry = self.slots.get(board)
+        if entry is None:
+            slot = len(self.slots)
+            if slot >= self.capacity:
+                raise ValueError(f"no free slot for {board!r} (capacity {self.capacity})")
+            entry = self.slots[board] = [slot, 0, KINDS.index(kind) if kind in KINDS else 0,
+                                         [math.nan] * len(FIELDS)]
+        return entry
+
+    def publish(self, board, values, stamp=None, state=None, kind=None):
+        """ Merges {field: value} into the board's slot; unknown fields are ignored """
+        with self.lock:
+            entry = self._slot(board, kind)
+            slot, seq, kind_code, current = entry
+            for field, value in values.items():
+                i = FIELD_INDEX.get(field)
+                if i is not None:
+                    current[i] = float(value)
+            offset = _slot_offset(slot)
+            SEQ.pack_into(self.buf, offset, (seq + 1) & 0xFFFFFFFF)  # odd: writing
+            BODY.pack_into(self.buf, offset + SEQ.size, kind_code,
+                           STATES.index(state) if state in STATES else 0,
+                           board.encode()[:32], time.time() if stamp is None else stamp, *current)
+            entry[1] = seq = (seq + 2) & 0xFFFFFFFF
+            SEQ.pack_into(self.buf, offset, seq)                     # even: consistent
+            if slot + 1 > HEADER.unpack_from(self.buf, 0)[4]:
+                HEADER.pack_into(self.buf, 0, MAGIC, VERSION, SLOT_SIZE, self.capacity, slot + 1)
+
+    def listener(self, board, kind=None):
+        """ Sample listener for HomeAutomationSystemConnection.addSampleListener """
+        def on_sample(connection, stamp, values):
+            state = "simulation" if getattr(connection, "simulation_mode", False) else connection.getState()
+            self.publish(board, values, stamp, state, kind or connection.BOARD_KIND)
+        return on_sample
+
+    def close(self, unlink=True):
+        self.buf = None
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+
+def attach_snapshot(connection, publisher, board):
+    # Seed the slot with what the connection already holds
+    publisher.publish(board, {f: getattr(connection, f) for f in FIELDS if hasattr(connection, f)},
+                      kind=connection.BOARD_KIND)
+    connection.addSampleListener(publisher.listener(board))
+
+
+def _attach(name):
+    """ Attaches without registering with the resource tracker (it would unlink the block on exit) """
+    try:
+        return shared_memory.SharedMemory(name, track=False)
+    except TypeError:   # Python < 3.13
+        from multiprocessing import resource_tracker
+        shm = shared_memory.SharedMemory(name)
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+class SnapshotReader:
+    def __init__(self, name="smarthome", retries=1000):
+        self.shm = _attach(name)
+        self.buf = self.shm.buf
+        self.retries = retries
+        magic, version, slot_size, self.capacity, _ = HEADER.unpack_from(self.buf, 0)
+        if magic != MAGIC or version != VERSION or slot_size != SLOT_SIZE:
+            self.close()
+            raise ValueError(f"shared memory {name!r} is not a board snapshot block")
+        self.index = {}     # board -> slot, filled lazily
+        self.scanned = 0    # slots already in the index
+
+    def _read_slot(self, slot):
+        """ (seq, body tuple) read consistently, None if the writer kept it busy """
+        offset = _slot_offset(slot)
+        buf = self.buf
+        for attempt in range(self.retries):
+            seq = SEQ.unpack_from(buf, offset)[0]
+            if seq & 1:
+                continue
+            body = BODY.unpack_from(buf, offset + SEQ.size)
+            if SEQ.unpack_from(buf, offset)[0] == seq:
+                return seq, body
+        return None
+
+    def _scan(self):
+        count = HEADER.unpack_from(self.buf, 0)[4]
+        while self.scanned < count:
+            read = self._read_slot(self.scanned)
+            if read is None:
+                return     # try again on the next call
+            self.index[read[1][2].rstrip(b"\0").decode(errors="replace")] = self.scanned
+            self.scanned += 1
+
+    def boards(self):
+        self._scan()
+        return list(self.index)
+
+    def version(self, board):
+        """ Slot sequence number: changes on every publish, cheap to poll """
+        if board not in self.index:
+            self._scan()
+        return SEQ.unpack_from(self.buf, _slot_offset(self.index[board]))[0]
+
+    def read(self, board):
+        """ {"kind", "state", "stamp", field: value, ...} with only this board's fields """
+        if board not in self.index:
+            self._scan()
+        read = self._read_slot(self.index[board])
+        if read is None:
+            raise TimeoutError(f"slot of {board!r} stayed busy")
+        kind, state, _, stamp, *values = read[1]
+        snapshot = {"kind": KINDS[kind], "state": STATES[state], "stamp": stamp}
+        for field, value in zip(FIELDS, values):
+            if not math.isnan(value):
+                snapshot[field] = value
+        return snapshot
+
+    def read_all(self):
+        return {board: self.read(board) for board in self.boards()}
+
+    def close(self):
+        self.buf = None
+        self.shm.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print the boards published in shared memory")
+    parser.add_argument("name", nargs="?", default="smarthome")
+    parser.add_argument("--watch", type=float, metavar="SECONDS", help="repeat every SECONDS")
+    args = parser.parse_args()
+    reader = SnapshotReader(args.name)
+    try:
+        while True:
+            for board, snapshot in sorted(reader.read_all().items()):
+                print(board, snapshot)
+            if not args.watch:
+                break
+            time.sleep(args.watch)
+            print()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        reader.close()
+
+
+if __name__ == "__main__":
+    main()
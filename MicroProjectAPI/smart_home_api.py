@@ -1,52 +1,907 @@
 import serial
+import math
 import time
-import random  # For simulation mode
+import queue
+import itertools
+import threading
+from concurrent.futures import Future, CancelledError, ThreadPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from link_stats import LinkStats
+
+# PIC16F877A USART receive FIFO is 2 bytes deep. Board 1 firmware never clears
+# OERR, so more than this many unanswered bytes in flight locks its receiver.
+PIC_RX_FIFO_DEPTH = 2
+
+# Board identification: both boards answer GET 0x05 (fan 0-99 / raw pressure
+# low byte), only Board 2 answers 0x07 (light frac, always 0 in its firmware).
+# Board 1 ignores opcodes 0x06-0x3F.
+IDENTIFY_WINDOW = (0x05, 0x07)
+BOARD_AC = "ac"
+BOARD_CURTAIN = "curtain"
+
+def encode_set_command(value):
+    """ Splits a setpoint into the two SET bytes: 10xxxxxx (Frac), 11xxxxxx (Int) """
+    int_part = int(value)
+    frac_part = int(round((value - int_part) * 10))
+    return 0x80 | (frac_part & 0x3F), 0xC0 | (int_part & 0x3F)
+
+class PacingController:
+    """
+    Adaptive inter-byte gap for one serial port.
+    calibrate() finds the smallest gap the board answers cleanly at, then the
+    gap doubles when timeouts/bad values become frequent and creeps back down
+    on clean transfers. A byte lost now and then (line noise) is not a reason
+    to slow down, so isolated errors leave the gap alone.
+    """
+    CLEAN_BEFORE_SPEEDUP = 20   # clean transfers before the gap is shrunk again
+    CALIBRATION_ROUNDS = 3      # probes per candidate gap, a majority must pass
+    ERROR_RATE_LIMIT = 0.25     # smoothed error share (1/8 per transfer) that widens the gap
+
+    def __init__(self, baudRate, maxGap=0.02, minTimeout=0.02, maxTimeout=0.1):
+        self.minGap = 10.0 / baudRate   # one UART frame (start + 8 data + stop)
+        self.maxGap = maxGap            # the old fixed 20 ms
+        self.floorGap = self.minGap
+        self.gap = maxGap
+        self.clean = 0
+        self.errors = 0
+        self.errorRate = 0.0            # smoothed share of transfers that failed
+        self.minTimeout = minTimeout
+        self.maxTimeout = maxTimeout    # the old fixed read timeout
+        self.rtt = None                 # smoothed round trip of clean windows
+
+    def pause(self):
+        if self.gap > 0:
+            time.sleep(self.gap)
+
+    def on_success(self):
+        self.errorRate -= self.errorRate / 8
+        self.clean += 1
+        if self.clean >= self.CLEAN_BEFORE_SPEEDUP and self.gap > self.floorGap:
+            self.gap = max(self.floorGap, self.gap * 0.75)
+            self.clean = 0
+
+    def on_error(self):
+        self.errors += 1
+        self.clean = 0
+        self.errorRate += (1.0 - self.errorRate) / 8
+        if self.errorRate > self.ERROR_RATE_LIMIT:
+            self.gap = min(self.maxGap, max(self.gap, self.minGap) * 2)
+
+    def on_reply(self, seconds):
+        self.rtt = seconds if self.rtt is None else self.rtt + (seconds - self.rtt) / 8
+
+    def on_timeout(self):
+        self.on_error()
+        # Maybe the board just got slower: widen the timeout before the next try
+        if self.rtt is not None:
+            self.rtt = min(self.maxTimeout, self.rtt * 2)
+
+    def replyTimeout(self, nbytes):
+        """
+        Read timeout for a window of nbytes: a few smoothed round trips rather
+        than a flat 100 ms, so a lost byte costs little. Rounded up to 5 ms
+        steps to keep the port from being reconfigured on every window.
+        """
+        if self.rtt is None:
+            return self.maxTimeout
+        timeout = max(self.minTimeout, 4 * self.rtt + nbytes * self.minGap)
+        return min(self.maxTimeout, math.ceil(timeout * 200) / 200)
+
+    def calibrate(self, probe):
+        """
+        Walks the gap down from maxGap, halving while most probe() calls at
+        a gap return True (one lost byte doesn't reject it). Settles one step
+        above the first failing gap.
+        """
+        good = None
+        candidate = self.maxGap
+        while candidate >= self.minGap:
+            self.gap = candidate
+            passed = sum(bool(probe()) for _ in range(self.CALIBRATION_ROUNDS))
+            if 2 * passed <= self.CALIBRATION_ROUNDS:
+                break
+            good = candidate
+            candidate /= 2
+        return self.settle(good)
+
+    def settle(self, good):
+        # Calibration only picks the starting gap; the floor stays at one frame,
+        # so a calibration spoilt by a lost byte is undone by clean transfers
+        # (and a gap that is really too short shows up as a high error rate)
+        self.gap = self.maxGap if good is None else good
+        self.floorGap = self.minGap
+        self.clean = 0
+        return self.gap
+
+def candidate_ports():
+    """ Every serial port the OS reports """
+    from serial.tools import list_ports
+    return [info.device for info in list_ports.comports()]
+
+# A probe left running by an earlier discovery must finish before the next one opens the port
+_probeLocks = {}
+_probeLocksGuard = threading.Lock()
+
+def identify_board(port, baudRate=9600, timeout=0.1, replyGap=0.05):
+    """
+    One GET window on `port`: BOARD_AC, BOARD_CURTAIN, or None when nothing
+    (or something else) answers. Costs one round trip, plus replyGap for Board 1.
+    """
+    with _probeLocksGuard:
+        lock = _probeLocks.setdefault(port, threading.Lock())
+    try:
+        with lock, serial.Serial(port, baudRate, timeout=timeout) as ser:
+            ser.reset_input_buffer()
+            ser.write(bytes(IDENTIFY_WINDOW))
+            first = ser.read(1)
+            if not first:
+                return None
+            # Board 2 sends its second reply right behind the first
+            ser.timeout = replyGap
+            second = ser.read(1)
+    except (serial.SerialException, OSError, ValueError):
+        return None   # busy, vanished or not a serial device
+    # Classify by the reply that is bounded on each board: a lone fan speed,
+    # or Board 2's constant light frac (its 0x05 reply can be any byte)
+    if not second:
+        return BOARD_AC if first[0] <= 99 else None
+    return BOARD_CURTAIN if second[0] == 0 else None
+
+def discover_boards(ports=None, exclude=(), baudRate=9600, timeout=0.1):
+    """
+    Probes all candidate ports concurrently and yields (port, kind) as each
+    board answers. Stop iterating to return early; the remaining probes
+    finish on their own.
+    """
+    ports = [p for p in (candidate_ports() if ports is None else ports) if p not in exclude]
+    if not ports:
+        return
+    pool = ThreadPoolExecutor(max_workers=len(ports), thread_name_prefix="port-probe")
+    try:
+        futures = {pool.submit(identify_board, p, baudRate, timeout): p for p in ports}
+        for future in as_completed(futures):
+            kind = future.result()
+            if kind is not None:
+                yield futures[future], kind
+    finally:
+        pool.shutdown(wait=False)
+
+# Transaction priorities: user commands jump ahead of queued poll windows
+PRIORITY_COMMAND = 0
+PRIORITY_POLL = 1
+
+class _Transaction:
+    def __init__(self, fn, key=None):
+        self.fn = fn
+        self.key = key
+        self.future = Future()
+
+class PortScheduler:
+    """
+    Single owner of one serial port. Transactions (callables doing a complete
+    write/read exchange) run one at a time on the owner thread, so bytes of
+    different transactions never interleave on the wire.
+    Keyed transactions are latest-wins: a newer submit with the same key
+    replaces one still waiting in the queue, the older future is cancelled.
+    """
+    def __init__(self, name="port"):
+        self.queue = queue.PriorityQueue()
+        self.seq = itertools.count()
+        self.lock = threading.Lock()
+        self.waiting = {}   # key -> queued _Transaction not started yet
+        self.running = False
+        self.thread = threading.Thread(target=self._run, name=f"scheduler-{name}", daemon=True)
+
+    def start(self):
+        self.running = True
+        self.thread.start()
+
+    def stop(self):
+        with self.lock:
+            # Under the lock: no submit can queue behind the drain in _run
+            self.running = False
+            # Sentinel sorts after everything, pending work is cancelled below
+            self.queue.put((float("inf"), next(self.seq), None))
+        if threading.current_thread() is not self.thread:
+            self.thread.join(1.0)
+
+    def is_owner(self):
+        return threading.current_thread() is self.thread
+
+    def submit(self, fn, priority=PRIORITY_POLL, key=None):
+        with self.lock:
+            if not self.running:
+                future = Future()
+                future.cancel()
+                return future
+            txn = self.waiting.get(key) if key is not None else None
+            if txn is not None:
+                # Coalesce: keep the queue slot, swap in the newest value
+                superseded = txn.future
+                txn.fn = fn
+                txn.future = Future()
+                superseded.cancel()
+                return txn.future
+            txn = _Transaction(fn, key)
+            if key is not None:
+                self.waiting[key] = txn
+            self.queue.put((priority, next(self.seq), txn))
+        return txn.future
+
+    def _run(self):
+        while True:
+            priority, seq, txn = self.queue.get()
+            if txn is None or not self.running:
+                if txn is not None:
+                    txn.future.cancel()
+                break
+            with self.lock:
+                if txn.key is not None:
+                    self.waiting.pop(txn.key, None)
+                fn, future = txn.fn, txn.future
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(fn())
+            except Exception as e:
+                future.set_exception(e)
+        # Drain whatever was still queued when we stopped
+        while True:
+            try:
+                priority, seq, txn = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if txn is not None:
+                txn.future.cancel()
+
+# Link health states (ConnectionSupervisor)
+STATE_DISCONNECTED = "disconnected"
+STATE_CONNECTED = "connected"
+STATE_DEGRADED = "degraded"
+STATE_RECONNECTING = "reconnecting"
+
+class ConnectionSupervisor:
+    """
+    Health of one board link. A poll that loses replies makes the link
+    degraded; FAILURE_LIMIT empty polls in a row (or the port itself going
+    away) make it reconnecting. Reconnects are then retried with exponential
+    backoff on a background thread, so a dead board costs no poll time.
+    """
+    FAILURE_LIMIT = 5
+
+    def __init__(self, minBackoff=0.5, maxBackoff=30.0):
+        self.minBackoff = minBackoff
+        self.maxBackoff = maxBackoff
+        self.lock = threading.Lock()
+        # The connection swaps in its port's clock (a trace replay runs on trace time)
+        self.clock = time.monotonic
+        self.state = STATE_DISCONNECTED
+        self.since = self.clock()
+        self.consecutive = 0        # empty polls in a row
+        self.failures = 0
+        self.successes = 0
+        self.attempts = 0           # reconnect attempts
+        self.reconnects = 0         # reconnects that worked
+        self.backoff = minBackoff
+        self.next_attempt = 0.0
+        self.attempting = False
+        self.last_success = None
+        self.last_error = None
+
+    def _set(self, state):
+        if state != self.state:
+            self.state = state
+            self.since = self.clock()
+
+    def on_connected(self):
+        with self.lock:
+            self.consecutive = 0
+            self.backoff = self.minBackoff
+            self.last_success = self.clock()
+            self._set(STATE_CONNECTED)
+
+    def on_closed(self):
+        with self.lock:
+            self._set(STATE_DISCONNECTED)
+
+    def on_success(self, complete=True):
+        with self.lock:
+            self.successes += 1
+            self.consecutive = 0
+            self.last_success = self.clock()
+            if self.state in (STATE_CONNECTED, STATE_DEGRADED):
+                self._set(STATE_CONNECTED if complete else STATE_DEGRADED)
+
+    def on_failure(self, error):
+        with self.lock:
+            self.failures += 1
+            self.consecutive += 1
+            self.last_error = str(error)
+            if self.state not in (STATE_CONNECTED, STATE_DEGRADED):
+                return
+            if self.consecutive >= self.FAILURE_LIMIT:
+                self._lost()
+            else:
+                self._set(STATE_DEGRADED)
+
+    def on_lost(self, error):
+        """ The port itself failed (unplugged, driver error): skip straight to reconnecting """
+        with self.lock:
+            self.last_error = str(error)
+            if self.state in (STATE_CONNECTED, STATE_DEGRADED):
+                self._lost()
+
+    def _lost(self):
+        self._set(STATE_RECONNECTING)
+        self.next_attempt = self.clock() + self.backoff
+
+    def should_attempt(self, now):
+        """ True (once) when a reconnect attempt is due; the caller must report back """
+        with self.lock:
+            if self.state != STATE_RECONNECTING or self.attempting or now < self.next_attempt:
+                return False
+            self.attempting = True
+            self.attempts += 1
+            return True
+
+    def attempt_failed(self, error):
+        with self.lock:
+            self.attempting = False
+            self.last_error = str(error)
+            self.backoff = min(self.maxBackoff, self.backoff * 2)
+            self.next_attempt = self.clock() + self.backoff
+
+    def attempt_succeeded(self):
+        """ False if the link was closed while the attempt ran """
+        with self.lock:
+            self.attempting = False
+            if self.state != STATE_RECONNECTING:
+                return False
+            self.reconnects += 1
+            self.consecutive = 0
+            self.backoff = self.minBackoff
+            self.last_success = self.clock()
+            self._set(STATE_CONNECTED)
+            return True
+
+    def health(self):
+        now = self.clock()
+        with self.lock:
+            return {
+                "state": self.state,
+                "state_age": now - self.since,
+                "consecutive_failures": self.consecutive,
+                "failures": self.failures,
+                "successes": self.successes,
+                "reconnect_attempts": self.attempts,
+                "reconnects": self.reconnects,
+                "backoff": self.backoff if self.state == STATE_RECONNECTING else 0.0,
+                "last_success_age": None if self.last_success is None else now - self.last_success,
+                "last_error": self.last_error,
+            }
+
+class RegisterCache:
+    """
+    Per-field refresh intervals (seconds) and the time each field was last
+    read or written. A field is only re-read once its TTL has run out.
+    """
+    def __init__(self, ttls):
+        self.ttls = dict(ttls)
+        self.stamps = {}
+        self.clock = time.monotonic
+
+    def setTTL(self, field, ttl):
+        self.ttls[field] = ttl
+
+    def due(self, field, now):
+        stamp = self.stamps.get(field)
+        return stamp is None or now - stamp >= self.ttls.get(field, 0.0)
+
+    def mark(self, field, now=None):
+        self.stamps[field] = self.clock() if now is None else now
+
+    def age(self, field):
+        """ Seconds since the field was last refreshed, None if never """
+        stamp = self.stamps.get(field)
+        return None if stamp is None else self.clock() - stamp
+
+    def invalidate(self, field=None):
+        if field is None:
+            self.stamps.clear()
+        else:
+            self.stamps.pop(field, None)
 
 class HomeAutomationSystemConnection:
+    # Register map: (field, frac GET opcode, int GET opcode).
+    # Frac opcode None -> single byte register (e.g. fan speed).
+    REGISTER_MAP = ()
+    # Fields whose pair is (low byte, high byte) of a raw 16-bit word rather
+    # than a frac digit and an int part; their low byte has no 0-9 check
+    WORD_REGISTERS = frozenset()
+    # Refresh interval per field, 0 = read on every update()
+    FIELD_TTLS = {}
+    # Plausible (min, max) per field; replies outside are treated as garbled
+    REGISTER_RANGES = {}
+    # Extra read passes over the registers that came back missing or garbled
+    READ_RETRIES = 1
+    # What identify_board() reports for this board type
+    BOARD_KIND = None
+    # Longest wait for one poll window, commands queued ahead of it included
+    WINDOW_WAIT = 2.0
+    # How far the value the firmware stores may be from the one requested
+    # for a confirmed SET (0.1 steps: exact)
+    SETPOINT_TOLERANCE = 0.05
+
     def __init__(self):
         self.comPort = "COM1" 
         self.baudRate = 9600
         self.ser = None
+        # Callable(port, baudrate, timeout=...) returning a Serial-like object;
+        # None = serial.Serial. serial_trace.py plugs its recorder / replayer in here.
+        self.serialFactory = None
         self.is_connected = False
+        # Max GET opcodes written back to back before reading their replies
+        self.batchWindow = PIC_RX_FIFO_DEPTH
+        self.pacing = PacingController(self.baudRate)
+        self.scheduler = None
+        self.cache = RegisterCache(self.FIELD_TTLS)
+        self.listeners = []
+        self.changeListeners = []
+        self.published = {}   # last value handed to change listeners, per field
+        self.supervisor = ConnectionSupervisor()
+        self.portLock = threading.Lock()
+        self.stats = None     # LinkStats once enableStats() is called
+        self.resync = False   # drain the input buffer before the next window
+        # Clock of the poll decisions (TTLs, reconnect backoff). A port object
+        # may bring its own: a trace recorder logs every reading, a replayer
+        # answers them from the trace, so replays take the same decisions.
+        self.clock = time.monotonic
+        self.timer = time.perf_counter   # window round trips
+        self.simulation_mode = False
+        self.fleet = None     # SimulatedFleet serving this board in simulation mode
+        self.simIndex = None  # this board's slot in the fleet
+        # Hands SET write-throughs to the listeners (thread started on first use)
+        self.notifier = ThreadPoolExecutor(max_workers=1, thread_name_prefix="notify")
 
     def setComPort(self, port):
         self.comPort = port
 
+    def set_simulation_mode(self, active, fleet=None):
+        """
+        Serves the registers from a virtual board in a SimulatedFleet (the
+        shared default fleet unless one is given) instead of the serial port.
+        """
+        if active and (self.fleet is None or (fleet is not None and fleet is not self.fleet)):
+            if fleet is None:
+                # NumPy is only needed once a board is simulated
+                from fleet_sim import default_fleet
+                fleet = default_fleet()
+            self.fleet = fleet
+            self.simIndex = fleet.add(self.BOARD_KIND)
+        self.simulation_mode = active
+        if active:
+            self._simulate()
+
+    def _simulate(self, sync=True):
+        if sync:
+            self.fleet.sync()
+        values = self.fleet.read(self.BOARD_KIND, self.simIndex)
+        for field, value in values.items():
+            setattr(self, field, value)
+        self._refreshed(list(values))
+
     def open(self):
         try:
-            # Timeout is critical to prevent UI freezing
-            self.ser = serial.Serial(self.comPort, self.baudRate, timeout=0.1)
-            self.ser.flushInput()
-            self.ser.flushOutput()
+            with self.portLock:
+                self._open_port()
+            self.published = {}
             self.is_connected = True
+            self.supervisor.on_connected()
             return True
         except Exception as e:
             print(f"Connection Error ({self.comPort}): {e}")
             self.is_connected = False
             return False
 
+    @classmethod
+    def discover(cls, ports=None, exclude=()):
+        """ First port where a board of this type answers, None if there is none """
+        for port, kind in discover_boards(ports, exclude):
+            if kind == cls.BOARD_KIND:
+                return port
+        return None
+
+    def autoConnect(self, ports=None, exclude=()):
+        """ discover() + open(); the board's values are valid once this returns True """
+        port = self.discover(ports, exclude)
+        if port is None:
+            print(f"Connection Error: no {self.BOARD_KIND} board found")
+            return False
+        self.setComPort(port)
+        return self.open()
+
     def close(self):
-        if self.ser and self.ser.is_open:
-            self.ser.close()
+        self.supervisor.on_closed()
+        with self.portLock:
+            self._release_port()
         self.is_connected = False
 
+    def _open_port(self):
+        # Timeout is critical to prevent UI freezing
+        self.ser = (self.serialFactory or serial.Serial)(self.comPort, self.baudRate, timeout=0.1)
+        self.clock = getattr(self.ser, "clock", time.monotonic)
+        # Stamps and ages only look at the time, they don't log a reading
+        self.cache.clock = self.supervisor.clock = getattr(self.ser, "now", time.monotonic)
+        self.timer = getattr(self.ser, "now", time.perf_counter)
+        self.ser.flushInput()
+        self.ser.flushOutput()
+        self.cache.invalidate()
+        self.pacing = PacingController(self.baudRate)
+        self.pacing.calibrate(self._probe)
+        self.scheduler = PortScheduler(self.comPort)
+        self.scheduler.start()
+
+    def _release_port(self):
+        if self.scheduler is not None:
+            self.scheduler.stop()
+            self.scheduler = None
+        if self.ser is not None:
+            try:
+                self.ser.close()
+            except (serial.SerialException, OSError):
+                pass   # already gone with the device
+            self.ser = None
+
+    def enableStats(self):
+        """ Starts counting link traffic (see link_stats.py), returns the LinkStats """
+        if self.stats is None:
+            self.stats = LinkStats()
+        return self.stats
+
+    def disableStats(self):
+        self.stats = None
+
+    def getStats(self):
+        return None if self.stats is None else self.stats.snapshot()
+
+    def getState(self):
+        return self.supervisor.state
+
+    def getHealth(self):
+        return self.supervisor.health()
+
+    def _supervise(self):
+        """
+        True if update() may poll. While reconnecting it returns False at once
+        and starts a background reconnect whenever the backoff has run out.
+        """
+        if self.supervisor.state != STATE_RECONNECTING:
+            return True
+        if self.supervisor.should_attempt(self.clock()):
+            threading.Thread(target=self._reconnect, name=f"reconnect-{self.comPort}", daemon=True).start()
+        return False
+
+    def _reconnect(self):
+        with self.portLock:
+            self._release_port()
+            try:
+                self._open_port()
+                if not self._probe():
+                    raise serial.SerialException("board does not answer")
+            except Exception as e:
+                # A vanished port raises SerialException or OSError depending on the platform
+                self._release_port()
+                self.supervisor.attempt_failed(e)
+                return
+            if not self.supervisor.attempt_succeeded():
+                self._release_port()   # close() ran meanwhile
+
+    def _port_lost(self, error):
+        if self.stats is not None:
+            self.stats.on_error()
+        self.pacing.on_error()
+        self.supervisor.on_lost(error)
+
+    def getInterByteGap(self):
+        return self.pacing.gap
+
+    def getAge(self, field):
+        return self.cache.age(field)
+
+    def addSampleListener(self, callback):
+        """ callback(connection, wall_time, {field: value}) after fields are read or written """
+        self.listeners.append(callback)
+
+    def removeSampleListener(self, callback):
+        if callback in self.listeners:
+            self.listeners.remove(callback)
+
+    def addChangeListener(self, callback):
+        """ callback(connection, {field: value}) with only the fields whose value changed """
+        self.changeListeners.append(callback)
+
+    def removeChangeListener(self, callback):
+        if callback in self.changeListeners:
+            self.changeListeners.remove(callback)
+
+    def _refreshed(self, fields, now=None):
+        """ Marks fields fresh in the cache and hands their values to the listeners """
+        for field in fields:
+            self.cache.mark(field, now)
+        self._publish(fields)
+
+    def _publish_later(self, fields):
+        """
+        Listener fan-out for what a SET transaction wrote, on the notifier
+        thread: on the port owner thread a listener's own SET (a rule driving
+        this board) would run inline, inside or between our transactions.
+        """
+        if fields and (self.listeners or self.changeListeners):
+            self.notifier.submit(self._publish, list(fields))
+
+    def _publish(self, fields):
+        if not fields or not (self.listeners or self.changeListeners):
+            return
+        values = {field: getattr(self, field) for field in fields}
+
+        if self.listeners:
+            stamp = time.time()
+            for callback in list(self.listeners):
+                try:
+                    callback(self, stamp, values)
+                except Exception as e:
+                    print(f"Listener Error ({self.comPort}): {e}")
+
+        if self.changeListeners:
+            changed = {f: v for f, v in values.items() if self.published.get(f) != v}
+            if not changed:
+                return
+            self.published.update(changed)
+            for callback in list(self.changeListeners):
+                try:
+                    callback(self, changed)
+                except Exception as e:
+                    print(f"Listener Error ({self.comPort}): {e}")
+
+    def snapshot(self):
+        """ {field: latest value} for every register of this board """
+        return {field: getattr(self, field) for field, op_frac, op_int in self.REGISTER_MAP}
+
+    def _get(self, field, with_age):
+        value = getattr(self, field)
+        return (value, self.cache.age(field)) if with_age else value
+
+    def _probe(self):
+        opcodes = self._register_opcodes()
+        replies = self._read_registers(opcodes)
+        # Calibration probes double as the first reading, no settle delay needed after open()
+        self._refreshed(self._apply_registers(replies))
+        return len(replies) == len(opcodes)
+
+    def _transact(self, fn, priority=PRIORITY_POLL, key=None):
+        """
+        Runs fn as one transaction on the port's owner thread and returns a Future.
+        Without a scheduler (before open() finishes) it runs inline.
+        """
+        scheduler = self.scheduler
+        if scheduler is not None and not scheduler.is_owner():
+            return scheduler.submit(fn, priority, key)
+        future = Future()
+        try:
+            future.set_result(fn())
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def _write_command(self, cmd_bytes):
+        for byte_val in cmd_bytes:
+            if not self._send_byte(byte_val):
+                return False
+        return True
+
+    def _encode_setpoint(self, value):
+        """ The SET pair to send for value """
+        return encode_set_command(value)
+
+    def _readback_bytes(self, cmd_frac, cmd_int):
+        """ (frac, int) the firmware stores for a SET pair, as GET returns them """
+        return cmd_frac & 0x3F, cmd_int & 0x3F
+
+    def _confirmed(self, value, replies, op_frac, op_int, cmd_frac, cmd_int):
+        """ Readback shows our SET pair was taken, and it stores (close to) the requested value """
+        if (replies[op_frac], replies[op_int]) != self._readback_bytes(cmd_frac, cmd_int):
+            return False
+        stored = float(replies[op_int]) + (float(replies[op_frac]) / 10.0)
+        return abs(stored - value) <= self.SETPOINT_TOLERANCE + 1e-9
+
+    def _set_register(self, value, confirm=False, callback=None):
+        """
+        Queues the two SET bytes for SET_REGISTER, latest-wins. With confirm the
+        register is read back in the same transaction. Returns a Future whose
+        result is True once the device holds the value, within SETPOINT_TOLERANCE
+        (False if the readback disagreed); it is cancelled if a newer value
+        replaced it in the queue.
+        """
+        field, op_frac, op_int = self.SET_REGISTER
+        cmd_frac, cmd_int = self._encode_setpoint(value)
+        if self.simulation_mode:
+            # The virtual board takes it at once (a curtain then starts travelling)
+            self.fleet.set_target(self.BOARD_KIND, self.simIndex, value)
+            self._simulate(sync=False)
+            future = Future()
+            future.set_result(True)
+            if callback is not None:
+                future.add_done_callback(callback)
+            return future
+        if self.supervisor.state == STATE_RECONNECTING:
+            future = Future()
+            future.set_result(False)
+            if callback is not None:
+                future.add_done_callback(callback)
+            return future
+
+        written = []    # published once the transaction is over, see _publish_later
+
+        def transaction():
+            if not self._write_command((cmd_frac, cmd_int)):
+                return False
+            # Write-through: the register now holds what the firmware stores for these bytes
+            stored_frac, stored_int = self._readback_bytes(cmd_frac, cmd_int)
+            setattr(self, field, float(stored_int) + (float(stored_frac) / 10.0))
+            self.cache.mark(field)
+            written.append(field)
+            if not confirm:
+                return True
+            replies = self._read_window([op_frac, op_int], {op_frac})
+            if replies.get(op_frac) is None or replies.get(op_int) is None:
+                return False
+            for updated in self._apply_registers(replies):
+                self.cache.mark(updated)
+                written.append(updated)
+            return self._confirmed(value, replies, op_frac, op_int, cmd_frac, cmd_int)
+
+        future = self._transact(transaction, PRIORITY_COMMAND, key=field)
+        future.add_done_callback(lambda done: self._publish_later(written))
+        if callback is not None:
+            future.add_done_callback(callback)
+        return future
+
     def _send_byte(self, byte_val):
         if self.ser and self.ser.is_open:
             try:
                 self.ser.write(bytes([byte_val]))
-                time.sleep(0.02) 
-            except:
-                pass
+                if self.stats is not None:
+                    self.stats.on_sent()
+                self.pacing.pause()
+                return True
+            except (serial.SerialException, OSError) as e:
+                self._port_lost(e)
+        return False
 
-    def _read_byte(self):
-        if self.ser and self.ser.is_open:
+    def _register_opcodes(self, fields=None):
+        opcodes = []
+        for field, op_frac, op_int in self.REGISTER_MAP:
+            if fields is not None and field not in fields:
+                continue
+            if op_frac is not None:
+                opcodes.append(op_frac)
+            opcodes.append(op_int)
+        return opcodes
+
+    def _frac_opcodes(self):
+        """ GET opcodes whose reply must be a 0-9 frac digit """
+        return {op_frac for field, op_frac, op_int in self.REGISTER_MAP
+                if op_frac is not None and field not in self.WORD_REGISTERS}
+
+    def _read_registers(self, opcodes):
+        """
+        Pipelined GET: opcodes are written batchWindow at a time with a single
+        ser.write, then the replies are collected with one bounded read.
+        Every window is its own transaction so commands can slip in between.
+        """
+        replies = {}
+        frac_ops = self._frac_opcodes()
+        for start in range(0, len(opcodes), self.batchWindow):
+            chunk = opcodes[start:start + self.batchWindow]
             try:
-                val = self.ser.read(1)
-                if val:
-                    return ord(val)
-            except:
-                pass
-        return None
+                window = self._transact(lambda c=chunk, p=bool(start): self._read_window(c, frac_ops, p))
+                replies.update(window.result(self.WINDOW_WAIT))
+            except (CancelledError, FutureTimeoutError):
+                break
+        return replies
+
+    def _read_window(self, chunk, frac_ops, pace=False):
+        """ One window: a single write of the opcodes and a single bounded read.
+        A window that comes back short, garbled or trailed by stray bytes is
+        dropped (replies can't be matched) and the input buffer is drained
+        before the next one, so one lost/late byte can't shift later replies. """
+        if not (self.ser and self.ser.is_open):
+            return {}
+        if pace:
+            self.pacing.pause()
+        try:
+            if self.resync:
+                self.ser.reset_input_buffer()
+                self.resync = False
+            timeout = self.pacing.replyTimeout(len(chunk))
+            if timeout != self.ser.timeout:
+                self.ser.timeout = timeout
+            started = self.timer()
+            self.ser.write(bytes(chunk))
+            data = self.ser.read(len(chunk))
+            rtt = self.timer() - started
+            stray = self.ser.in_waiting if len(data) == len(chunk) else 0
+        except (serial.SerialException, OSError) as e:
+            self._port_lost(e)
+            return {}
+        # Short window = timeout, frac digit > 9 = garbled reply
+        bad = [op for op, val in zip(chunk, data) if op in frac_ops and val > 9]
+        accepted = len(data) == len(chunk) and not bad and not stray
+        if self.stats is not None:
+            self.stats.on_window(chunk, data, rtt, bad, accepted)
+        if len(data) != len(chunk):
+            self.pacing.on_timeout()
+            self.resync = True
+            return {}
+        if not accepted:
+            self.pacing.on_error()
+            self.resync = True
+            return {}
+        self.pacing.on_success()
+        self.pacing.on_reply(rtt)
+        return dict(zip(chunk, data))
+
+    def _apply_registers(self, replies):
+        """ Stores complete, plausible register replies, returns the fields that were updated """
+        updated = []
+        for field, op_frac, op_int in self.REGISTER_MAP:
+            val_int = replies.get(op_int)
+            if val_int is None:
+                continue
+            if op_frac is None:
+                value = val_int
+            else:
+                val_frac = replies.get(op_frac)
+                if val_frac is None:
+                    continue
+                if field in self.WORD_REGISTERS:
+                    value = (val_int << 8) | val_frac
+                else:
+                    value = float(val_int) + (float(val_frac) / 10.0)
+            bounds = self.REGISTER_RANGES.get(field)
+            if bounds is not None and not (bounds[0] <= value <= bounds[1]):
+                stats = getattr(self, "stats", None)
+                if stats is not None:
+                    stats.on_bad(op_int)
+                continue
+            setattr(self, field, value)
+            updated.append(field)
+        return updated
+
+    def _poll_registers(self):
+        # Only fields whose TTL ran out go on the wire
+        now = self.clock()
+        fields = [field for field, op_frac, op_int in self.REGISTER_MAP if self.cache.due(field, now)]
+        if not fields:
+            return
+        replies = self._read_registers(self._register_opcodes(fields))
+        updated = self._apply_registers(replies)
+        for attempt in range(self.READ_RETRIES):
+            # Re-read only what came back missing or implausible
+            missing = [field for field in fields if field not in updated]
+            if not missing or not updated:
+                break   # nothing to fix, or the board isn't answering at all
+            self.resync = True
+            updated += self._apply_registers(self._read_registers(self._register_opcodes(missing)))
+        if updated:
+            self.supervisor.on_success(complete=len(updated) == len(fields))
+        else:
+            self.supervisor.on_failure("no reply")
+        finished = self.clock()
+        if self.stats is not None:
+            self.stats.on_poll(finished - now)
+        self._refreshed(updated, finished)
+
 
 class AirConditionerSystemConnection(HomeAutomationSystemConnection):
     """
@@ -55,131 +910,107 @@ class AirConditionerSystemConnection(HomeAutomationSystemConnection):
       GET: 0x01 (Des.Frac), 0x02 (Des.Int), 0x03 (Amb.Frac), 0x04 (Amb.Int), 0x05 (Fan)
       SET: 10xxxxxx (Frac), 11xxxxxx (Int)
     """
+    REGISTER_MAP = (
+        ("desiredTemperature", 0x01, 0x02),
+        ("ambientTemperature", 0x03, 0x04),
+        ("fanSpeed",           None, 0x05),
+    )
+    SET_REGISTER = REGISTER_MAP[0]
+    BOARD_KIND = BOARD_AC
+    # Target only changes when we write it or someone uses the keypad
+    FIELD_TTLS = {"desiredTemperature": 5.0, "ambientTemperature": 0.0, "fanSpeed": 0.0}
+    # Firmware clamps the target to 10-50 and the fan to 0-99
+    REGISTER_RANGES = {"desiredTemperature": (10.0, 50.9), "ambientTemperature": (0.0, 99.9),
+                       "fanSpeed": (0, 99)}
+
     def __init__(self):
         super().__init__()
         self.desiredTemperature = 0.0
         self.ambientTemperature = 0.0
         self.fanSpeed = 0
 
-    def setDesiredTemp(self, temp):
+    def setDesiredTemp(self, temp, confirm=False, callback=None):
+        """ Returns False on a bad range, otherwise a Future (see _set_register) """
         if not (10.0 <= temp <= 50.0):
             print("Error: Temperature must be between 10.0 and 50.0")
             return False
-        
-        int_part = int(temp)
-        frac_part = int(round((temp - int_part) * 10))
-
-        cmd_frac = 0x80 | (frac_part & 0x3F)
-        self._send_byte(cmd_frac)
-        
-        cmd_int = 0xC0 | (int_part & 0x3F)
-        self._send_byte(cmd_int)
-        return True
-
-    def update(self):
-        if not self.is_connected: return
-
-        self._send_byte(0x01) # Get Desired Frac
-        d_frac = self._read_byte()
-        self._send_byte(0x02) # Get Desired Int
-        d_int = self._read_byte()
-        
-        if d_int is not None and d_frac is not None:
-            self.desiredTemperature = float(d_int) + (float(d_frac) / 10.0)
-
-        self._send_byte(0x03) # Get Amb Frac
-        a_frac = self._read_byte()
-        self._send_byte(0x04) # Get Amb Int
-        a_int = self._read_byte()
 
-        if a_int is not None and a_frac is not None:
-            self.ambientTemperature = float(a_int) + (float(a_frac) / 10.0)
+        return self._set_register(temp, confirm, callback)
 
-        self._send_byte(0x05) # Get Fan
-        fan = self._read_byte()
-        if fan is not None:
-            self.fanSpeed = fan
+    def update(self):
+        if self.simulation_mode:
+            self._simulate()
+            return
+        if not self.is_connected or not self._supervise(): return
+        self._poll_registers()
 
-    def getDesiredTemp(self): return self.desiredTemperature
-    def getAmbientTemp(self): return self.ambientTemperature
-    def getFanSpeed(self): return self.fanSpeed
+    # with_age=True -> (value, seconds since it was read/written)
+    def getDesiredTemp(self, with_age=False): return self._get("desiredTemperature", with_age)
+    def getAmbientTemp(self, with_age=False): return self._get("ambientTemperature", with_age)
+    def getFanSpeed(self, with_age=False): return self._get("fanSpeed", with_age)
 
 
 class CurtainControlSystemConnection(HomeAutomationSystemConnection):
     """
     Board #2 (Curtain) Protocol Implementation
+    Protocol:
+      GET: 0x01/0x02 (Curtain), 0x03/0x04 (Out.Temp), 0x05/0x06 (Pressure L/H), 0x07/0x08 (Light)
+      SET: 10xxxxxx (Frac), 11xxxxxx (Int)
+    Pressure is the raw, uncompensated BMP180 reading (PRESSURE_H:PRESSURE_L),
+    not a decimal value: 0x05 is its low byte (0-255), 0x06 its high byte.
     """
+    REGISTER_MAP = (
+        ("curtainStatus",      0x01, 0x02),
+        ("outdoorTemperature", 0x03, 0x04),
+        ("outdoorPressure",    0x05, 0x06),
+        ("lightIntensity",     0x07, 0x08),
+    )
+    SET_REGISTER = REGISTER_MAP[0]
+    BOARD_KIND = BOARD_CURTAIN
+    WORD_REGISTERS = frozenset({"outdoorPressure"})
+    # MAP_63_TO_100 steps are up to 2 %, the nearest entry is at most 1 % off
+    SETPOINT_TOLERANCE = 1.0
+    # Target only changes when we write it or someone turns the pot
+    FIELD_TTLS = {"curtainStatus": 5.0, "outdoorTemperature": 1.0,
+                  "outdoorPressure": 5.0, "lightIntensity": 0.0}
+    # Pressure has no range: any 16-bit raw sensor word is possible
+    REGISTER_RANGES = {"curtainStatus": (0.0, 100.9), "outdoorTemperature": (0.0, 99.9),
+                       "lightIntensity": (0.0, 255.0)}
+
     def __init__(self):
         super().__init__()
         self.curtainStatus = 0.0
         self.outdoorTemperature = 0.0
-        self.outdoorPressure = 0.0
+        self.outdoorPressure = 0      # raw BMP180 counts
         self.lightIntensity = 0.0
-        self.simulation_mode = False 
-
-    def set_simulation_mode(self, active):
-        self.simulation_mode = active
 
-    def setCurtainStatus(self, status):
+    def setCurtainStatus(self, status, confirm=False, callback=None):
+        """ Returns a Future (see _set_register) """
         if status < 0.0: status = 0.0
         if status > 100.0: status = 100.0
-        
-        if self.simulation_mode:
-            self.curtainStatus = status
-            return True
+        return self._set_register(status, confirm, callback)
 
-        int_part = int(status)
-        frac_part = int(round((status - int_part) * 10))
+    def _encode_setpoint(self, status):
+        # SET_INT carries 0-63, which the firmware maps through MAP_63_TO_100
+        # (round(n * 100 / 63)); send its inverse so the target lands on the
+        # table entry nearest the requested percentage
+        cmd_frac, _ = encode_set_command(status)
+        return cmd_frac, 0xC0 | int(int(status) * 63 / 100 + 0.5)
 
-        cmd_frac = 0x80 | (frac_part & 0x3F) # 10xxxxxx
-        self._send_byte(cmd_frac)
-        
-        cmd_int = 0xC0 | (int_part & 0x3F) # 11xxxxxx
-        self._send_byte(cmd_int)
-        return True
+    def _readback_bytes(self, cmd_frac, cmd_int):
+        # SET_INT goes through the firmware's MAP_63_TO_100 table
+        return cmd_frac & 0x3F, int(round((cmd_int & 0x3F) * 100 / 63))
 
     def update(self):
         if self.simulation_mode:
-            self.outdoorTemperature = round(random.uniform(15.0, 30.0), 1)
-            self.outdoorPressure = round(random.uniform(1000.0, 1020.0), 1)
-            self.lightIntensity = round(random.uniform(200.0, 800.0), 1)
+            self._simulate()
             return
 
-        if not self.is_connected: return
-
-        # 1. Curtain Status
-        self._send_byte(0x01)
-        c_frac = self._read_byte()
-        self._send_byte(0x02)
-        c_int = self._read_byte()
-        if c_int is not None and c_frac is not None:
-            self.curtainStatus = float(c_int) + (float(c_frac) / 10.0)
-
-        # 2. Outdoor Temp
-        self._send_byte(0x03)
-        t_frac = self._read_byte()
-        self._send_byte(0x04)
-        t_int = self._read_byte()
-        if t_int is not None and t_frac is not None:
-            self.outdoorTemperature = float(t_int) + (float(t_frac) / 10.0)
-
-        # 3. Outdoor Pressure
-        self._send_byte(0x05)
-        p_frac = self._read_byte()
-        self._send_byte(0x06)
-        p_int = self._read_byte()
-        if p_int is not None and p_frac is not None:
-            self.outdoorPressure = float(p_int) + (float(p_frac) / 10.0)
-
-        # 4. Light Intensity
-        self._send_byte(0x07)
-        l_frac = self._read_byte()
-        self._send_byte(0x08)
-        l_int = self._read_byte()
-        if l_int is not None and l_frac is not None:
-            self.lightIntensity = float(l_int) + (float(l_frac) / 10.0)
-
-    def getCurtainStatus(self): return self.curtainStatus
-    def getOutdoorTemp(self): return self.outdoorTemperature
-    def getOutdoorPress(self): return self.outdoorPressure
-    def getLightIntensity(self): return self.lightIntensity
\ No newline at end of file
+        if not self.is_connected or not self._supervise(): return
+        self._poll_registers()
+
+    # with_age=True -> (value, seconds since it was read/written)
+    def getCurtainStatus(self, with_age=False): return self._get("curtainStatus", with_age)
+    def getOutdoorTemp(self, with_age=False): return self._get("outdoorTemperature", with_age)
+    def getOutdoorPress(self, with_age=False): return self._get("outdoorPressure", with_age)
+    def getLightIntensity(self, with_age=False): return self._get("lightIntensity", with_age)
\ No newline at end of file
@@ -0,0 +1,349 @@
+import asyncio
+import time
+import contextlib
+from collections import deque
+import serial
+import serial_asyncio
+from smart_home_api import (HomeAutomationSystemConnection, AirConditionerSystemConnection,
+                            CurtainControlSystemConnection, PacingController, RegisterCache,
+                            PIC_RX_FIFO_DEPTH, PRIORITY_COMMAND, PRIORITY_POLL)
+
+
+class _PortLock:
+    """
+    One holder per port at a time, like PortScheduler's owner thread: a GET
+    window or a SET pair never interleaves with another. When the port is
+    freed, waiting commands go before waiting poll windows.
+    """
+    def __init__(self):
+        self.held = False
+        self.waiters = {PRIORITY_COMMAND: deque(), PRIORITY_POLL: deque()}
+
+    @contextlib.asynccontextmanager
+    async def hold(self, priority=PRIORITY_POLL):
+        if self.held or any(self.waiters.values()):
+            waiter = asyncio.get_running_loop().create_future()
+            self.waiters[priority].append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    self._release()      # handed to us just as we were cancelled
+                else:
+                    self.waiters[priority].remove(waiter)
+                raise
+        self.held = True
+        try:
+            yield
+        finally:
+            self._release()
+
+    def _release(self):
+        for priority in (PRIORITY_COMMAND, PRIORITY_POLL):
+            queue = self.waiters[priority]
+            while queue:
+                waiter = queue.popleft()
+                if not waiter.done():
+                    waiter.set_result(None)   # stays held, ownership passes on
+                    return
+        self.held = False
+
+
+class _SerialProtocol(asyncio.Protocol):
+    """ Collects received bytes so a window of replies can be awaited without blocking the loop. """
+    def __init__(self):
+        self.transport = None
+        self.buffer = bytearray()
+        self.waiter = None
+        self.wanted = 0
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def connection_lost(self, exc):
+        self.transport = None
+        self._wake()
+
+    def data_received(self, data):
+        self.buffer.extend(data)
+        if len(self.buffer) >= self.wanted:
+            self._wake()
+
+    def _wake(self):
+        if self.waiter is not None and not self.waiter.done():
+            self.waiter.set_result(None)
+
+    async def read(self, n, timeout):
+        """ Returns up to n bytes, whatever arrived before the timeout. """
+        if len(self.buffer) < n and self.transport is not None:
+            self.wanted = n
+            self.waiter = asyncio.get_running_loop().create_future()
+            try:
+                await asyncio.wait_for(self.waiter, timeout)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                self.waiter = None
+        data = bytes(self.buffer[:n])
+        del self.buffer[:n]
+        return data
+
+    def flush(self):
+        self.buffer.clear()
+
+
+class AsyncHomeAutomationSystemConnection:
+    """
+    asyncio counterpart of HomeAutomationSystemConnection.
+    Same register maps, batching and pacing; all I/O is awaited on the event loop.
+    """
+    REGISTER_MAP = ()
+    WORD_REGISTERS = frozenset()
+    FIELD_TTLS = {}
+    REGISTER_RANGES = {}
+    READ_RETRIES = 1
+
+    # Pure helpers shared with the blocking driver
+    _register_opcodes = HomeAutomationSystemConnection._register_opcodes
+    _frac_opcodes = HomeAutomationSystemConnection._frac_opcodes
+    _apply_registers = HomeAutomationSystemConnection._apply_registers
+    _encode_setpoint = HomeAutomationSystemConnection._encode_setpoint
+    _readback_bytes = HomeAutomationSystemConnection._readback_bytes
+    getAge = HomeAutomationSystemConnection.getAge
+
+    def __init__(self):
+        self.comPort = "COM1"
+        self.baudRate = 9600
+        self.transport = None
+        self.protocol = None
+        self.is_connected = False
+        self.batchWindow = PIC_RX_FIFO_DEPTH
+        self.pacing = PacingController(self.baudRate)
+        self.cache = RegisterCache(self.FIELD_TTLS)
+        self.port = _PortLock()
+        self.pendingSets = {}   # field -> token of the newest requested value, latest wins
+        self.resync = False     # drain the receive buffer before the next window
+
+    def setComPort(self, port):
+        self.comPort = port
+
+    async def open(self):
+        try:
+            loop = asyncio.get_running_loop()
+            self.transport, self.protocol = await serial_asyncio.create_serial_connection(
+                loop, _SerialProtocol, self.comPort, baudrate=self.baudRate)
+            await asyncio.sleep(0)  # let connection_made / reader registration run
+            self.is_connected = True
+            self.pacing = PacingController(self.baudRate)
+            await self._calibrate()
+            return True
+        except Exception as e:
+            print(f"Connection Error ({self.comPort}): {e}")
+            self.is_connected = False
+            return False
+
+    async def close(self):
+        if self.transport is not None:
+            self.transport.close()
+        self.transport = None
+        self.is_connected = False
+
+    def getInterByteGap(self):
+        return self.pacing.gap
+
+    async def _calibrate(self):
+        # Same walk as PacingController.calibrate, with an awaitable probe
+        good = None
+        candidate = self.pacing.maxGap
+        while candidate >= self.pacing.minGap:
+            self.pacing.gap = candidate
+            passed = 0
+            for _ in range(self.pacing.CALIBRATION_ROUNDS):
+                passed += bool(await self._probe())
+            if 2 * passed <= self.pacing.CALIBRATION_ROUNDS:
+                break
+            good = candidate
+            candidate /= 2
+        return self.pacing.settle(good)
+
+    async def _probe(self):
+        opcodes = self._register_opcodes()
+        replies = await self._read_registers(opcodes)
+        # Calibration probes double as the first reading
+        now = time.monotonic()
+        for field in self._apply_registers(replies):
+            self.cache.mark(field, now)
+        return len(replies) == len(opcodes)
+
+    async def _pause(self):
+        if self.pacing.gap > 0:
+            await asyncio.sleep(self.pacing.gap)
+
+    async def _send_byte(self, byte_val):
+        if self.transport is not None:
+            try:
+                self.transport.write(bytes([byte_val]))
+                await self._pause()
+            except (serial.SerialException, OSError) as e:
+                self._port_lost(e)
+
+    def _port_lost(self, error):
+        # No supervisor here: report it and stop polling until open() is called again
+        print(f"Port Error ({self.comPort}): {error}")
+        self.pacing.on_error()
+        if self.transport is not None:
+            self.transport.close()
+        self.transport = None
+        self.is_connected = False
+
+    async def _read_registers(self, opcodes):
+        replies = {}
+        if self.transport is None:
+            return replies
+
+        frac_ops = self._frac_opcodes()
+        for start in range(0, len(opcodes), self.batchWindow):
+            chunk = opcodes[start:start + self.batchWindow]
+            # Every window holds the port on its own so commands can slip in between
+            async with self.port.hold(PRIORITY_POLL):
+                if self.transport is None:
+                    break
+                if start:
+                    await self._pause()
+                if self.resync:
+                    self.protocol.flush()
+                    self.resync = False
+                try:
+                    started = time.perf_counter()
+                    self.transport.write(bytes(chunk))
+                    data = await self.protocol.read(len(chunk), self.pacing.replyTimeout(len(chunk)))
+                    rtt = time.perf_counter() - started
+                    stray = len(self.protocol.buffer) if len(data) == len(chunk) else 0
+                except (serial.SerialException, OSError) as e:
+                    self._port_lost(e)
+                    break
+            # Same checks as the blocking _read_window: a short, garbled or
+            # over-long window is dropped and the buffer drained before the next
+            if len(data) != len(chunk):
+                self.pacing.on_timeout()
+                self.resync = True
+                continue
+            if stray or any(op in frac_ops and val > 9 for op, val in zip(chunk, data)):
+                self.pacing.on_error()
+                self.resync = True
+                continue
+            self.pacing.on_success()
+            self.pacing.on_reply(rtt)
+            replies.update(zip(chunk, data))
+        return replies
+
+    async def _poll_registers(self):
+        now = time.monotonic()
+        fields = [field for field, op_frac, op_int in self.REGISTER_MAP if self.cache.due(field, now)]
+        if not fields:
+            return
+        replies = await self._read_registers(self._register_opcodes(fields))
+        updated = self._apply_registers(replies)
+        for attempt in range(self.READ_RETRIES):
+            missing = [field for field in fields if field not in updated]
+            if not missing or not updated:
+                break
+            self.resync = True
+            updated += self._apply_registers(await self._read_registers(self._register_opcodes(missing)))
+        now = time.monotonic()
+        for field in updated:
+            self.cache.mark(field, now)
+
+    async def update(self):
+        if not self.is_connected: return
+        await self._poll_registers()
+
+    async def _set_register(self, field, value):
+        """
+        Sends the SET pair with the port held, ahead of waiting poll windows.
+        Returns True once written, None if a newer value for the same field
+        was requested before this one got the port (only the newest is sent).
+        """
+        token = self.pendingSets[field] = object()
+        async with self.port.hold(PRIORITY_COMMAND):
+            if self.pendingSets.get(field) is not token:
+                return None
+            del self.pendingSets[field]
+            cmd_frac, cmd_int = self._encode_setpoint(value)
+            await self._send_byte(cmd_frac)
+            await self._send_byte(cmd_int)
+        stored_frac, stored_int = self._readback_bytes(cmd_frac, cmd_int)
+        setattr(self, field, float(stored_int) + (float(stored_frac) / 10.0))
+        self.cache.mark(field)
+        return True
+
+
+class AsyncAirConditionerSystemConnection(AsyncHomeAutomationSystemConnection):
+    """ Board #1 (Air Conditioner), see AirConditionerSystemConnection for the protocol """
+    REGISTER_MAP = AirConditionerSystemConnection.REGISTER_MAP
+    FIELD_TTLS = AirConditionerSystemConnection.FIELD_TTLS
+    REGISTER_RANGES = AirConditionerSystemConnection.REGISTER_RANGES
+
+    def __init__(self):
+        super().__init__()
+        self.desiredTemperature = 0.0
+        self.ambientTemperature = 0.0
+        self.fanSpeed = 0
+
+    async def setDesiredTemp(self, temp):
+        if not (10.0 <= temp <= 50.0):
+            print("Error: Temperature must be between 10.0 and 50.0")
+            return False
+
+        return await self._set_register("desiredTemperature", temp)
+
+    def getDesiredTemp(self): return self.desiredTemperature
+    def getAmbientTemp(self): return self.ambientTemperature
+    def getFanSpeed(self): return self.fanSpeed
+
+
+class AsyncCurtainControlSystemConnection(AsyncHomeAutomationSystemConnection):
+    """ Board #2 (Curtain), see CurtainControlSystemConnection for the protocol """
+    REGISTER_MAP = CurtainControlSystemConnection.REGISTER_MAP
+    WORD_REGISTERS = CurtainControlSystemConnection.WORD_REGISTERS
+    FIELD_TTLS = CurtainControlSystemConnection.FIELD_TTLS
+    REGISTER_RANGES = CurtainControlSystemConnection.REGISTER_RANGES
+    _encode_setpoint = CurtainControlSystemConnection._encode_setpoint
+    _readback_bytes = CurtainControlSystemConnection._readback_bytes
+
+    def __init__(self):
+        super().__init__()
+        self.curtainStatus = 0.0
+        self.outdoorTemperature = 0.0
+        self.outdoorPressure = 0      # raw BMP180 counts
+        self.lightIntensity = 0.0
+
+    async def setCurtainStatus(self, status):
+        if status < 0.0: status = 0.0
+        if status > 100.0: status = 100.0
+
+        return await self._set_register("curtainStatus", status)
+
+    def getCurtainStatus(self): return self.curtainStatus
+    def getOutdoorTemp(self): return self.outdoorTemperature
+    def getOutdoorPress(self): return self.outdoorPressure
+    def getLightIntensity(self): return self.lightIntensity
+
+
+async def poll_forever(connection, period=0.5, on_update=None):
+    """
+    Refreshes one board every `period` seconds. The schedule only depends on
+    this board's own link, a slow neighbour never delays it.
+    """
+    while True:
+        started = time.monotonic()
+        if connection.is_connected:
+            await connection.update()
+            if on_update is not None:
+                on_update(connection)
+        await asyncio.sleep(max(0.0, period - (time.monotonic() - started)))
+
+
+async def poll_boards(connections, period=0.5, on_update=None):
+    """ Polls every connection concurrently from the running event loop. """
+    await asyncio.gather(*(poll_forever(c, period, on_update) for c in connections))
@@ -0,0 +1,194 @@
+"""
+Append-only binary telemetry log.
+
+A log is a directory of segment files plus index.json (board / field ids):
+
+    segment-000001.tlm, segment-000002.tlm, ...
+
+Each segment is a 16-byte header followed by fixed 16-byte records
+(little endian): t float64 (unix time), board uint16, field uint16, value float32.
+Segments rotate at `segment_size` bytes and are never rewritten, so the
+reader can mmap them and view them as NumPy structured arrays without copying.
+
+    writer = TelemetryWriter("telemetry")
+    attach_telemetry(connection, writer, "living-ac")
+    ...
+    reader = TelemetryReader("telemetry")
+    t, v = reader.series("living-ac", "ambientTemperature")
+"""
+import os
+import json
+import mmap
+import glob
+import struct
+import threading
+import numpy as np
+
+MAGIC = b"HATLM001"
+HEADER = struct.Struct("<8sHHI")          # magic, version, record size, reserved
+RECORD = struct.Struct("<dHHf")
+RECORD_DTYPE = np.dtype([("t", "<f8"), ("board", "<u2"), ("field", "<u2"), ("value", "<f4")])
+VERSION = 1
+SEGMENT_PATTERN = "segment-%06d.tlm"
+
+
+class _Index:
+    """ Name <-> id tables for boards and fields, persisted as index.json """
+    def __init__(self, directory):
+        self.path = os.path.join(directory, "index.json")
+        self.boards = {}
+        self.fields = {}
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                data = json.load(f)
+            self.boards = data.get("boards", {})
+            self.fields = data.get("fields", {})
+
+    def _id(self, table, name):
+        if name not in table:
+            table[name] = len(table)
+            self.save()
+        return table[name]
+
+    def board_id(self, name):
+        return self._id(self.boards, name)
+
+    def field_id(self, name):
+        return self._id(self.fields, name)
+
+    def save(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"boards": self.boards, "fields": self.fields}, f, indent=1)
+        os.replace(tmp, self.path)
+
+
+class TelemetryWriter:
+    def __init__(self, directory, segment_size=64 * 1024 * 1024, flush_every=256):
+        self.directory = directory
+        self.segment_size = segment_size
+        self.flush_every = flush_every
+        os.makedirs(directory, exist_ok=True)
+        self.index = _Index(directory)
+        self.lock = threading.Lock()
+        self.file = None
+        self.size = 0
+        self.pending = 0
+        existing = sorted(glob.glob(os.path.join(directory, "segment-*.tlm")))
+        self.segment_no = int(os.path.basename(existing[-1])[8:14]) if existing else 0
+        self._rotate()
+
+    def _rotate(self):
+        if self.file is not None:
+            self.file.close()
+        self.segment_no += 1
+        path = os.path.join(self.directory, SEGMENT_PATTERN % self.segment_no)
+        self.file = open(path, "ab")
+        self.file.write(HEADER.pack(MAGIC, VERSION, RECORD.size, 0))
+        self.size = HEADER.size
+
+    def write(self, board, timestamp, values):
+        """ One record per field in values ({field: number}) """
+        with self.lock:
+            if self.file is None:
+                return
+            board_id = self.index.board_id(board)
+            data = b"".join(RECORD.pack(timestamp, board_id, self.index.field_id(field), float(value))
+                            for field, value in values.items())
+            if self.size + len(data) > self.segment_size:
+                self._rotate()
+            self.file.write(data)
+            self.size += len(data)
+            self.pending += len(values)
+            if self.pending >= self.flush_every:
+                self.file.flush()
+                self.pending = 0
+
+    def listener(self, board):
+        """ Sample listener for HomeAutomationSystemConnection.addSampleListener """
+        return lambda connection, timestamp, values: self.write(board, timestamp, values)
+
+    def flush(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.flush()
+                self.pending = 0
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+
+def attach_telemetry(connection, writer, board):
+    connection.addSampleListener(writer.listener(board))
+
+
+class TelemetryReader:
+    """
+    Maps every segment read-only; segments() are zero-copy structured arrays.
+    Filtering (query/series) necessarily produces new arrays.
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        self.index = _Index(directory)
+        self.maps = []
+        self.arrays = []
+        for path in sorted(glob.glob(os.path.join(directory, "segment-*.tlm"))):
+            size = os.path.getsize(path)
+            if size <= HEADER.size:
+                continue
+            with open(path, "rb") as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, version, record_size, _ = HEADER.unpack_from(mm, 0)
+            if magic != MAGIC or record_size != RECORD_DTYPE.itemsize:
+                mm.close()
+                continue
+            # A record still being written at the tail is left out
+            count = (size - HEADER.size) // record_size
+            self.maps.append(mm)
+            self.arrays.append(np.frombuffer(mm, dtype=RECORD_DTYPE, count=count, offset=HEADER.size))
+
+    def segments(self):
+        return self.arrays
+
+    def __len__(self):
+        return sum(len(a) for a in self.arrays)
+
+    def query(self, board=None, field=None, t0=None, t1=None):
+        """ Records matching all given filters, as one structured array """
+        board_id = None if board is None else self.index.boards.get(board, -1)
+        field_id = None if field is None else self.index.fields.get(field, -1)
+        parts = []
+        for arr in self.arrays:
+            if t0 is not None and len(arr) and arr["t"][-1] < t0:
+                continue
+            if t1 is not None and len(arr) and arr["t"][0] >= t1:
+                continue
+            mask = np.ones(len(arr), dtype=bool)
+            if board_id is not None:
+                mask &= arr["board"] == board_id
+            if field_id is not None:
+                mask &= arr["field"] == field_id
+            if t0 is not None:
+                mask &= arr["t"] >= t0
+            if t1 is not None:
+                mask &= arr["t"] < t1
+            parts.append(arr[mask])
+        if not parts:
+            return np.empty(0, dtype=RECORD_DTYPE)
+        return np.concatenate(parts)
+
+    def series(self, board, field, t0=None, t1=None):
+        records = self.query(board, field, t0, t1)
+        return records["t"], records["value"]
+
+    def close(self):
+        self.arrays = []
+        for mm in self.maps:
+            try:
+                mm.close()
+            except BufferError:
+                pass   # a caller still holds a view, the map goes with it
+        self.maps = []
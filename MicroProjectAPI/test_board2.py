@@ -1,7 +1,7 @@
-import time
-import msvcrt
-import os
+import argparse
 from smart_home_api import CurtainControlSystemConnection
+from board_manager import BoardManager
+from dashboard import run_dashboard
 
 # --- AYARLAR ---
 # Board 1 kapali, sadece Board 2 portunu aciyoruz.
@@ -9,72 +9,40 @@ from smart_home_api import CurtainControlSystemConnection
 PC_PERDE_PORT = "COM9"
 # ---------------
 
-def clear_screen():
-    os.system('cls' if os.name == 'nt' else 'clear')
-
 def main():
-    perde = CurtainControlSystemConnection()
-    perde.setComPort(PC_PERDE_PORT)
-
-    print(f"Board 2 (Perde) Baglantisi Kuruluyor: {PC_PERDE_PORT}...")
-    
-    if not perde.open():
+    global PC_PERDE_PORT
+    parser = argparse.ArgumentParser(description="Board 2 console")
+    parser.add_argument("--port", default=PC_PERDE_PORT, help="COM port, ya da tum portlari taramak icin 'auto'")
+    parser.add_argument("--daemon", metavar="URL", help="acquisition_daemon adresi (COM port yerine)")
+    parser.add_argument("--board", default="living-curtain", help="daemon uzerindeki board adi")
+    args = parser.parse_args()
+
+    if args.daemon:
+        from daemon_client import RemoteCurtainControlSystemConnection
+        perde = RemoteCurtainControlSystemConnection(args.daemon)
+        PC_PERDE_PORT = args.board
+    else:
+        perde = CurtainControlSystemConnection()
+        PC_PERDE_PORT = args.port
+
+    if PC_PERDE_PORT == "auto":
+        print("Board 2 (Perde) tum portlarda araniyor...")
+        connected = perde.autoConnect()
+        PC_PERDE_PORT = perde.comPort
+    else:
+        print(f"Board 2 (Perde) Baglantisi Kuruluyor: {PC_PERDE_PORT}...")
+        perde.setComPort(PC_PERDE_PORT)
+        connected = perde.open()
+
+    if not connected:
         print("!!! BAGLANTI HATASI !!!")
         print("Lutfen com0com ayarlarini (COM9 <-> COM10) kontrol edin.")
         return
 
-    print("Baglanti Basarili! Veriler bekleniyor...")
-    time.sleep(2)
-
-    while True:
-        try:
-            # Verileri PIC'ten cek
-            perde.update()
-
-            clear_screen()
-            print("##############################################")
-            print("   BOARD 2 - PERDE & SENSOR SISTEMI")
-            print("##############################################")
-            print(f"BAGLI PORT: {PC_PERDE_PORT}")
-            print("-" * 30)
-            print(f"DIS SICAKLIK    :  {perde.getOutdoorTemp():.1f} C")
-            print(f"DIS BASINC      :  {perde.getOutdoorPress():.1f} kPa") # Kodda 101 gonderiyor
-            print(f"PERDE DURUMU    : %{perde.getCurtainStatus():.1f}")
-            print(f"ISIK SIDDETI    :  {perde.getLightIntensity():.1f}")
-            print("-" * 30)
-            print("[1] Perdeyi %0 (ACIK) Yap")
-            print("[2] Perdeyi %50 (YARI) Yap")
-            print("[3] Perdeyi %100 (KAPALI) Yap")
-            print("[4] Cikis")
-            print("-" * 30)
-
-            # Klavye Kontrolü (Non-blocking)
-            if msvcrt.kbhit():
-                key = msvcrt.getch().decode('utf-8').lower()
-
-                if key == '1':
-                    print("\n>> Perde %0'a ayarlaniyor...")
-                    perde.setCurtainStatus(0.0)
-                    time.sleep(1)
-                elif key == '2':
-                    print("\n>> Perde %50'ye ayarlaniyor...")
-                    perde.setCurtainStatus(50.0)
-                    time.sleep(1)
-                elif key == '3':
-                    print("\n>> Perde %100'e ayarlaniyor...")
-                    perde.setCurtainStatus(100.0)
-                    time.sleep(1)
-                elif key == '4':
-                    print("Cikis...")
-                    perde.close()
-                    break
-            
-            # Veri akis hizi
-            time.sleep(0.5)
-
-        except KeyboardInterrupt:
-            perde.close()
-            break
+    # Dashboard: 1/2/3 -> perde %0/%50/%100, s -> deger gir, q -> cikis
+    manager = BoardManager(period=0.1, workers=1)
+    manager.register(args.board if args.daemon else "board2-perde", perde, "Board 2", "curtain")
+    run_dashboard(manager, title=f"BOARD 2 - PERDE & SENSOR SISTEMI | PORT: {PC_PERDE_PORT}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
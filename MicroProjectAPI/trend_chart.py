@@ -0,0 +1,136 @@
+"""
+Rolling trend chart on a Tk canvas, drawn incrementally.
+
+Time maps to a fixed canvas x (one pixel column = window / width seconds) and
+the view scrolls by moving the scrollregion, so existing items are never
+touched again. Each series draws ONE canvas item per pixel column, holding
+that column's min/max/last, so a 24 h view at 10 Hz still costs only `width`
+items per series. Items that scroll off the left edge are deleted.
+
+Zooming (set_window) is the only full redraw; it pulls pre-bucketed data from
+a provider such as SensorHistory.downsample.
+"""
+import math
+import tkinter as tk
+from collections import deque
+
+
+class _Series:
+    def __init__(self, color):
+        self.color = color
+        self.items = deque()      # (column, canvas item id), oldest first
+        self.column = None        # column currently being filled
+        self.lo = self.hi = self.last = None
+        self.prev = None          # (x, y) where the previous column ended
+
+
+class TrendChart(tk.Canvas):
+    def __init__(self, parent, y_min, y_max, window=60.0, width=380, height=110, **kwargs):
+        kwargs.setdefault("bg", "#FFFFFF")
+        kwargs.setdefault("highlightthickness", 0)
+        super().__init__(parent, width=width, height=height, **kwargs)
+        self.plot_width = width
+        self.plot_height = height
+        self.y_min = y_min
+        self.y_max = y_max
+        self.window = window
+        self.origin = None
+        self.series = {}
+        self.provider = None      # provider(name, t0, t1, buckets) -> (starts, mins, maxs, means)
+        self.right = width
+
+    def add_series(self, name, color):
+        self.series[name] = _Series(color)
+
+    def set_provider(self, provider):
+        self.provider = provider
+
+    # --- coordinates ---
+    def _column(self, t):
+        return int(math.floor((t - self.origin) * self.plot_width / self.window))
+
+    def _y(self, value):
+        span = (self.y_max - self.y_min) or 1.0
+        frac = (value - self.y_min) / span
+        frac = min(1.0, max(0.0, frac))
+        return 2 + (1.0 - frac) * (self.plot_height - 4)
+
+    def _scroll_to(self, column):
+        if column + 1 > self.right:
+            self.right = column + 1
+            self.configure(scrollregion=(self.right - self.plot_width, 0, self.right, self.plot_height))
+            self.xview_moveto(0)
+            left = self.right - self.plot_width
+            for s in self.series.values():
+                while s.items and s.items[0][0] < left:
+                    self.delete(s.items.popleft()[1])
+
+    # --- drawing ---
+    def _points(self, s, column):
+        # Joins the previous column, then spans this column's min..max, ending at the last value
+        x = float(column)
+        points = [] if s.prev is None else [s.prev[0], s.prev[1]]
+        return points + [x, self._y(s.lo), x, self._y(s.hi), x, self._y(s.last)]
+
+    def add_sample(self, name, t, value):
+        s = self.series.get(name)
+        if s is None:
+            return
+        if self.origin is None:
+            self.origin = t - self.window
+        if value > self.y_max:
+            # Out of range: grow the axis once and rebuild from history
+            self.y_max = _nice_ceiling(value)
+            self.redraw(t)
+            return
+
+        column = self._column(t)
+        if column == s.column:
+            s.lo, s.hi, s.last = min(s.lo, value), max(s.hi, value), value
+            self.coords(s.items[-1][1], *self._points(s, column))
+            return
+
+        if s.column is not None:
+            s.prev = (float(s.column), self._y(s.last))
+        s.column, s.lo, s.hi, s.last = column, value, value, value
+        self._scroll_to(column)
+        item = self.create_line(*self._points(s, column), fill=s.color, width=1)
+        s.items.append((column, item))
+
+    def set_window(self, seconds, now):
+        self.window = float(seconds)
+        self.redraw(now)
+
+    def redraw(self, now):
+        """ Full rebuild (zoom / axis change): one column per pixel from the provider """
+        self.delete("all")
+        self.origin = now - self.window
+        self.right = self.plot_width
+        self.configure(scrollregion=(0, 0, self.plot_width, self.plot_height))
+        self.xview_moveto(0)
+        for name, s in self.series.items():
+            s.items.clear()
+            s.column = s.prev = None
+            if self.provider is None:
+                continue
+            starts, mins, maxs, means = self.provider(name, self.origin, now, self.plot_width)
+            for column in range(len(starts)):
+                if mins[column] != mins[column]:   # NaN: no data in this column
+                    continue
+                if s.column is not None:
+                    s.prev = (float(s.column), self._y(s.last))
+                s.column = column
+                s.lo, s.hi, s.last = float(mins[column]), float(maxs[column]), float(means[column])
+                item = self.create_line(*self._points(s, column), fill=s.color, width=1)
+                s.items.append((column, item))
+
+
+def _nice_ceiling(value):
+    """ 734 -> 1000, 61 -> 100: next 1/2/5 x 10^n step """
+    if value <= 0:
+        return 1.0
+    exp = 10 ** math.floor(math.log10(value))
+    for step in (1, 2, 5, 10):
+        if step * exp >= value:
+            return float(step * exp)
+    return float(10 * exp)